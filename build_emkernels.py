@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Compila AOT (Numba pycc) os núcleos escalares de microstrip_kernels.py, usados
+por quar17061153.py, no módulo de extensão "emkernels" (.so/.pyd nesta pasta).
+
+Uso (uma vez por máquina/versão de Python):
+  pip install numba
+  python build_emkernels.py
+
+Atenção: numba.pycc está obsoleto no Numba e será removido; em versões sem
+pycc este script falha com uma mensagem clara e o app segue usando @njit.
+Sem o módulo compilado, o app usa @njit (se houver Numba) ou Python puro.
+"""
+
+import os
+
+try:
+    from numba.pycc import CC
+except ImportError as e:
+    raise SystemExit(f"numba.pycc indisponível ({e}); instale uma versão do Numba com pycc "
+                     "ou use o app sem o módulo AOT (@njit/Python puro).")
+
+import microstrip_kernels as mk
+
+cc = CC("emkernels")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# mesmas funções Python do app: as fórmulas existem só em microstrip_kernels.py
+cc.export("hammerstad_w", "f8(f8, f8, f8)")(mk.hammerstad_w)
+cc.export("eff_eps", "f8(f8, f8, f8)")(mk.eff_eps)
+cc.export("patch_dims_er", "UniTuple(f8, 3)(f8, f8, f8)")(mk.patch_dims_er)
+
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"emkernels compilado em {cc.output_dir}")
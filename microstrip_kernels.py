@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleos escalares de microstrip/patch (Hammerstad) em Python puro.
+
+Fonte única das fórmulas: quar17061153.py as usa diretamente ou via @njit,
+e build_emkernels.py as compila AOT no módulo "emkernels".
+"""
+
+import math
+
+C0 = 299_792_458.0
+
+
+def hammerstad_w(er, h_mm, z0):
+    """Largura (mm) de microstrip para Z0, εr, h(mm)."""
+    h = float(h_mm)
+    A = z0 / 60.0 * math.sqrt((er + 1) / 2) + (er - 1) / (er + 1) * (0.23 + 0.11 / er)
+    w_h = (8 * math.exp(A)) / (math.exp(2 * A) - 2)
+    if w_h < 2:
+        W = w_h * h
+    else:
+        B = (377 * math.pi) / (2 * z0 * math.sqrt(er))
+        W = h * (2 / math.pi) * (B - 1 - math.log(2 * B - 1)
+             + (er - 1) / (2 * er) * (math.log(B - 1) + 0.39 - 0.61 / er))
+    return max(W, 0.05)
+
+
+def eff_eps(er, h_mm, w_mm):
+    """εef Hammerstad."""
+    h = float(h_mm)
+    w = max(w_mm, 1e-3)
+    u = w / h
+    a = 1 + (1 / 49.0) * math.log((u**4 + (u/52.0)**2)/(u**4 + 0.432)) + (1/18.7) * math.log(1 + (u/18.1)**3)
+    b = 0.564 * ((er - 0.9)/(er + 3))**0.053
+    return (er + 1) / 2 + (er - 1) / 2 * (1 + 10 / u)**(-a * b)
+
+
+def patch_dims_er(f_ghz, er, h_mm):
+    """Dimensões de patch (L, W) e λg aproximado (mm)."""
+    f = f_ghz * 1e9
+    h = h_mm / 1000.0
+    W = C0 / (2 * f) * math.sqrt(2 / (er + 1))
+    eeff = (er + 1) / 2 + (er - 1) / 2 * (1 + 12 * h / W)**-0.5
+    dL = 0.412 * h * ((eeff + 0.3) * (W / h + 0.264)) / ((eeff - 0.258) * (W / h + 0.8))
+    L_eff = C0 / (2 * f * math.sqrt(eeff))
+    L = L_eff - 2 * dL
+    lamg = C0 / (f * math.sqrt(eeff))
+    return L * 1000.0, W * 1000.0, lamg * 1000.0
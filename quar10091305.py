@@ -9,6 +9,7 @@ Correções implementadas:
 - Adicionado timeout para operações bloqueantes
 """
 
+import io
 import os
 import re
 import tempfile
@@ -19,6 +20,7 @@ import math
 import json
 import traceback
 import queue
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, List, Optional, Dict, Any
 
 import numpy as np
@@ -33,10 +35,68 @@ from tkinter import messagebox
 
 from ansys.aedt.core import Desktop, Hfss
 
+# Numba é opcional: sem ele os kernels numéricos usam NumPy puro
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # ---------- Aparência ----------
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+# ---------- Constantes ----------
+_LN10_OVER_20 = math.log(10.0) / 20.0  # 10**(x/20) == exp(x * ln10/20)
+
+
+# ---------- Kernels numéricos ----------
+def _spherical_to_xyz_np(R: np.ndarray, thr: np.ndarray, phr: np.ndarray,
+                         X: np.ndarray, Y: np.ndarray, Z: np.ndarray):
+    """(R[Nt,Np], θ[Nt], φ[Np]) em rad -> X, Y, Z (escritos em buffers já alocados)."""
+    sT = np.sin(thr)[:, None]; cT = np.cos(thr)[:, None]
+    sP = np.sin(phr)[None, :]; cP = np.cos(phr)[None, :]
+    np.multiply(R, sT, out=X); X *= cP
+    np.multiply(R, sT, out=Y); Y *= sP
+    np.multiply(R, cT, out=Z)
+    return X, Y, Z
+
+
+if NUMBA_AVAILABLE:
+    # serial de propósito: a grade tem poucos milhares de pontos (φ em passos de 10°), e o
+    # custo de acordar o pool de threads do parallel=True/prange supera o laço inteiro
+    @njit(cache=True, fastmath=True)
+    def _spherical_to_xyz(R, thr, phr, X, Y, Z):
+        """Versão compilada de `_spherical_to_xyz_np` (um passe, sem temporários)."""
+        nt, nphi = R.shape
+        sP = np.sin(phr); cP = np.cos(phr)
+        for i in range(nt):
+            sT = math.sin(thr[i]); cT = math.cos(thr[i])
+            for j in range(nphi):
+                r = R[i, j]
+                X[i, j] = r * sT * cP[j]
+                Y[i, j] = r * sT * sP[j]
+                Z[i, j] = r * cT
+        return X, Y, Z
+
+    @njit(cache=True)
+    def _minmax(a):
+        """(min, max) de `a` em um único passe."""
+        flat = a.ravel()
+        mn = flat[0]; mx = flat[0]
+        for v in flat[1:]:
+            if v < mn:
+                mn = v
+            elif v > mx:
+                mx = v
+        return mn, mx
+else:
+    _spherical_to_xyz = _spherical_to_xyz_np
+
+    def _minmax(a: np.ndarray):
+        """(min, max) de `a`."""
+        return a.min(), a.max()
+
 
 class ModernPatchAntennaDesigner:
     """Aplicativo GUI para dimensionamento e simulação de patch array em HFSS."""
@@ -57,13 +117,25 @@ class ModernPatchAntennaDesigner:
         self.created_ports: List[str] = []
         self.simulation_running = False
         self.simulation_thread = None
+        self._io_pool: Optional[ThreadPoolExecutor] = None
 
         # Dados em memória
         self.last_s11_analysis = None
         self.theta_cut = None
         self.phi_cut = None
         self.grid3d = None
+        self._surf3d = None
+        self._buf3d: Dict[tuple, tuple] = {}
+        self._cut_lines: Dict[str, tuple] = {}
+        # Cache de cortes/grade 3D por (f0, passos, fontes); limpo a cada novo solve
+        self._pattern_cache: Dict[tuple, tuple] = {}
+        self._source_sig: Optional[tuple] = None
+        self._last_rendered_sig: Optional[tuple] = None
         self.auto_refresh_job = None
+        self._apply_job = None
+        # Impede refreshes sobrepostos (auto-refresh + interação do usuário)
+        self._refresh_lock = threading.Lock()
+        self._built_signature: Optional[Tuple] = None
         
         # Otimização
         self.original_params = {}
@@ -73,6 +145,9 @@ class ModernPatchAntennaDesigner:
         self.original_theta_data = None
         self.original_phi_data = None
 
+        # Cache de textos dos rótulos (evita configure redundante)
+        self._label_cache: Dict[str, str] = {}
+
         # Parâmetros do usuário (default)
         self.params = {
             "frequency": 10.0,
@@ -231,6 +306,10 @@ class ModernPatchAntennaDesigner:
         # Seção de parâmetros de antena
         sec_ant = self.create_section(main, "Antenna Parameters", "Fundamental design parameters", 0, 0)
         self.entries = []
+        # mesmas entradas separadas por tipo, para atualizar a UI sem cadeia de isinstance
+        self._entry_widgets = []
+        self._stringvar_widgets = []
+        self._boolvar_widgets = []
         row_idx = 2
 
         def add_entry(section, label, key, value, row, tooltip=None, combo=None, check=False, unit=""):
@@ -269,18 +348,21 @@ class ModernPatchAntennaDesigner:
                                         height=32, corner_radius=6)
                 widget.grid(row=0, column=0, sticky="ew")
                 self.entries.append((key, var))
+                self._stringvar_widgets.append((key, var))
             elif check:
                 var = ctk.BooleanVar(value=value)
                 widget = ctk.CTkCheckBox(input_frame, text="", variable=var, 
                                         width=20, height=20, corner_radius=4)
                 widget.grid(row=0, column=0, sticky="w")
                 self.entries.append((key, var))
+                self._boolvar_widgets.append((key, var))
             else:
                 widget = ctk.CTkEntry(input_frame, font=ctk.CTkFont(size=13),
                                      height=32, corner_radius=6)
                 widget.insert(0, str(value))
                 widget.grid(row=0, column=0, sticky="ew")
                 self.entries.append((key, widget))
+                self._entry_widgets.append((key, widget))
             
             return row + 1
 
@@ -539,6 +621,11 @@ class ModernPatchAntennaDesigner:
         self.src_frame = ctk.CTkFrame(control_frame, fg_color=("gray94", "gray16"), corner_radius=8)
         self.src_frame.grid(row=0, column=0, sticky="ew", padx=5, pady=(5, 10))
         self.source_controls: Dict[str, Dict[str, ctk.CTkBaseClass]] = {}
+        # pool de linhas (label/entry/slider) reaproveitadas entre populações
+        self._src_widget_pool: List[Dict[str, ctk.CTkBaseClass]] = []
+        self._src_head = None
+        self._src_grid = None
+        self._src_empty_label = None
         
         # Controles de resultado
         btn_frame = ctk.CTkFrame(control_frame, fg_color="transparent")
@@ -813,6 +900,12 @@ class ModernPatchAntennaDesigner:
             self.quick_status.configure(fg_color=colors[color])
         self.quick_status.configure(text=status)
 
+    def _set_label(self, widget, key: str, text: str):
+        """Atualiza o texto do rótulo apenas se mudou desde a última chamada."""
+        if self._label_cache.get(key) != text:
+            widget.configure(text=text)
+            self._label_cache[key] = text
+
     # ------------- Utilidades de Log -------------
     def log_message(self, message: str):
         """Enfileira uma mensagem para o textbox de log com carimbo de hora."""
@@ -967,15 +1060,15 @@ class ModernPatchAntennaDesigner:
             self.calculated_params["feed_offset"] = 0.30 * L_mm
             self.calculate_substrate_size()
             # UI
-            self.patches_label.configure(text=f"Number of Patches: {rows*cols}")
-            self.rows_cols_label.configure(text=f"Configuration: {rows} x {cols}")
-            self.spacing_label.configure(text=f"Spacing: {spacing_mm:.2f} mm ({self.params['spacing_type']})")
-            self.dimensions_label.configure(text=f"Patch Dimensions: {L_mm:.2f} x {W_mm:.2f} mm")
-            self.lambda_label.configure(text=f"Guided Wavelength: {lambda_g_mm:.2f} mm")
-            self.feed_offset_label.configure(text=f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
-            self.substrate_dims_label.configure(
-                text=f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x "
-                     f"{self.calculated_params['substrate_length']:.2f} mm")
+            self._set_label(self.patches_label, "patches", f"Number of Patches: {rows*cols}")
+            self._set_label(self.rows_cols_label, "rows_cols", f"Configuration: {rows} x {cols}")
+            self._set_label(self.spacing_label, "spacing", f"Spacing: {spacing_mm:.2f} mm ({self.params['spacing_type']})")
+            self._set_label(self.dimensions_label, "dimensions", f"Patch Dimensions: {L_mm:.2f} x {W_mm:.2f} mm")
+            self._set_label(self.lambda_label, "lambda", f"Guided Wavelength: {lambda_g_mm:.2f} mm")
+            self._set_label(self.feed_offset_label, "feed_offset", f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
+            self._set_label(self.substrate_dims_label, "substrate_dims",
+                            f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x "
+                            f"{self.calculated_params['substrate_length']:.2f} mm")
             self.status_label.configure(text="Parameters calculated successfully")
             self.log_message("Parameters calculated successfully")
             self.update_quick_status("Ready", "success")
@@ -1025,8 +1118,8 @@ class ModernPatchAntennaDesigner:
         self.log_message(f"Air coax set: a={a:.3f} mm, b={b:.3f} mm (b/a={ba:.3f}≈2.3 → ~50 Ω)")
         return a, b, wall, Lp, clear
 
-    def _create_coax_feed_lumped(self, ground, substrate, x_feed: float, y_feed: float, name_prefix: str):
-        """Constrói pino, blindagem e porta lumped no plano inferior."""
+    def _create_coax_feed_lumped(self, ground, substrate, x_feed: str, y_feed: str, name_prefix: str):
+        """Constrói pino, blindagem e porta lumped no plano inferior (x/y como expressões HFSS)."""
         try:
             a_val = float(self.params["probe_radius"])
             b_val = a_val * float(self.params["coax_ba_ratio"])
@@ -1065,7 +1158,9 @@ class ModernPatchAntennaDesigner:
             r_start = a_val + eps_line; r_end = b_val - eps_line
             if r_end <= r_start:
                 r_end = a_val + 0.75 * (b_val - a_val)
-            p1 = [x_feed + r_start, y_feed, -Lp_val]; p2 = [x_feed + r_end, y_feed, -Lp_val]
+            # x/y_feed são expressões em variáveis mm: os deslocamentos levam a unidade explícita
+            p1 = [f"{x_feed}+{r_start}mm", f"{y_feed}", f"{-Lp_val}mm"]
+            p2 = [f"{x_feed}+{r_end}mm", f"{y_feed}", f"{-Lp_val}mm"]
 
             self.hfss.lumped_port(assignment=port_ring.name, integration_line=[p1, p2],
                                   impedance=50.0, name=f"{name_prefix}_Lumped", renormalize=True)
@@ -1177,6 +1272,10 @@ class ModernPatchAntennaDesigner:
                 
             # Aplicar as fontes
             self._edit_sources_with_vars(exs, pvars, phvars)
+            # Nova solução: padrões em cache não valem mais
+            self._pattern_cache.clear()
+            self._source_sig = None
+            self._last_rendered_sig = None
             
             # Construir painel de fontes na UI
             self.populate_source_controls(exs)
@@ -1372,14 +1471,14 @@ class ModernPatchAntennaDesigner:
             self.calculated_params["lambda_g"] *= scaling_factor
                 
             # Atualizar UI com novas dimensões
-            self.patches_label.configure(text=f"Number of Patches: {self.calculated_params['num_patches']}")
-            self.rows_cols_label.configure(text=f"Configuration: {self.calculated_params['rows']} x {self.calculated_params['cols']}")
-            self.spacing_label.configure(text=f"Spacing: {self.calculated_params['spacing']:.2f} mm ({self.params['spacing_type']})")
-            self.dimensions_label.configure(text=f"Patch Dimensions: {self.calculated_params['patch_length']:.2f} x {self.calculated_params['patch_width']:.2f} mm")
-            self.lambda_label.configure(text=f"Guided Wavelength: {self.calculated_params['lambda_g']:.2f} mm")
-            self.feed_offset_label.configure(text=f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
-            self.substrate_dims_label.configure(
-                text=f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x {self.calculated_params['substrate_length']:.2f} mm")
+            self._set_label(self.patches_label, "patches", f"Number of Patches: {self.calculated_params['num_patches']}")
+            self._set_label(self.rows_cols_label, "rows_cols", f"Configuration: {self.calculated_params['rows']} x {self.calculated_params['cols']}")
+            self._set_label(self.spacing_label, "spacing", f"Spacing: {self.calculated_params['spacing']:.2f} mm ({self.params['spacing_type']})")
+            self._set_label(self.dimensions_label, "dimensions", f"Patch Dimensions: {self.calculated_params['patch_length']:.2f} x {self.calculated_params['patch_width']:.2f} mm")
+            self._set_label(self.lambda_label, "lambda", f"Guided Wavelength: {self.calculated_params['lambda_g']:.2f} mm")
+            self._set_label(self.feed_offset_label, "feed_offset", f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
+            self._set_label(self.substrate_dims_label, "substrate_dims",
+                            f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x {self.calculated_params['substrate_length']:.2f} mm")
             
             # Definir flag otimizada
             self.optimized = True
@@ -1390,7 +1489,8 @@ class ModernPatchAntennaDesigner:
                                           "Design parameters have been adjusted. Would you like to run the simulation with the optimized dimensions?")
             
             if response:
-                self.run_simulation()
+                # Mesmo layout: basta atualizar variáveis e reanalisar
+                self.run_simulation(reuse_geometry=self._can_reuse_geometry())
                 
         except Exception as e:
             self.log_message(f"Error in frequency optimization: {e}")
@@ -1413,14 +1513,14 @@ class ModernPatchAntennaDesigner:
                 self.calculated_params[key] = self.original_params[key]
                 
             # Atualizar UI
-            self.patches_label.configure(text=f"Number of Patches: {self.calculated_params['num_patches']}")
-            self.rows_cols_label.configure(text=f"Configuration: {self.calculated_params['rows']} x {self.calculated_params['cols']}")
-            self.spacing_label.configure(text=f"Spacing: {self.calculated_params['spacing']:.2f} mm ({self.params['spacing_type']})")
-            self.dimensions_label.configure(text=f"Patch Dimensions: {self.calculated_params['patch_length']:.2f} x {self.calculated_params['patch_width']:.2f} mm")
-            self.lambda_label.configure(text=f"Guided Wavelength: {self.calculated_params['lambda_g']:.2f} mm")
-            self.feed_offset_label.configure(text=f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
-            self.substrate_dims_label.configure(
-                text=f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x {self.calculated_params['substrate_length']:.2f} mm")
+            self._set_label(self.patches_label, "patches", f"Number of Patches: {self.calculated_params['num_patches']}")
+            self._set_label(self.rows_cols_label, "rows_cols", f"Configuration: {self.calculated_params['rows']} x {self.calculated_params['cols']}")
+            self._set_label(self.spacing_label, "spacing", f"Spacing: {self.calculated_params['spacing']:.2f} mm ({self.params['spacing_type']})")
+            self._set_label(self.dimensions_label, "dimensions", f"Patch Dimensions: {self.calculated_params['patch_length']:.2f} x {self.calculated_params['patch_width']:.2f} mm")
+            self._set_label(self.lambda_label, "lambda", f"Guided Wavelength: {self.calculated_params['lambda_g']:.2f} mm")
+            self._set_label(self.feed_offset_label, "feed_offset", f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
+            self._set_label(self.substrate_dims_label, "substrate_dims",
+                            f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x {self.calculated_params['substrate_length']:.2f} mm")
             
             # Redefinir flags
             self.optimized = False
@@ -1431,7 +1531,146 @@ class ModernPatchAntennaDesigner:
             messagebox.showinfo("Reset Complete", "Design parameters have been reset to their original values.")
 
     # ------------- Simulação -------------
-    def _run_simulation_thread(self):
+    def _geometry_signature(self) -> Tuple:
+        """Assinatura do que não é parametrizado por variáveis (layout, feed, material, setup)."""
+        return (int(self.calculated_params["rows"]), int(self.calculated_params["cols"]),
+                tuple(sorted((k, str(v)) for k, v in self.params.items())))
+
+    def _can_reuse_geometry(self) -> bool:
+        """True se o design atual em HFSS pode ser reanalisado só com novas variáveis."""
+        return (self.hfss is not None and self._built_signature is not None
+                and self._built_signature == self._geometry_signature())
+
+    def _apply_design_variables(self):
+        """Envia as dimensões atuais de `calculated_params` para as variáveis do design."""
+        L = float(self.calculated_params["patch_length"])
+        W = float(self.calculated_params["patch_width"])
+        spacing = float(self.calculated_params["spacing"])
+        rows = int(self.calculated_params["rows"])
+        cols = int(self.calculated_params["cols"])
+        h_sub = float(self.params["substrate_thickness"])
+        sub_w = float(self.calculated_params["substrate_width"])
+        sub_l = float(self.calculated_params["substrate_length"])
+        self._set_design_variables(L, W, spacing, rows, cols, h_sub, sub_w, sub_l)
+
+    def _reanalyze_with_updated_vars(self):
+        """Atualiza apenas as variáveis do design; geometria, portas e setup são reaproveitados."""
+        self.log_message("Reusing existing geometry: updating design variables only")
+        self._apply_design_variables()
+
+    def _build_geometry(self):
+        """Cria projeto, substrato, patches, alimentações, contornos e setup."""
+        self._open_or_create_project()
+
+        self.hfss.modeler.model_units = "mm"
+        self.log_message("Model units set to: mm")
+
+        sub_name = self.params["substrate_material"]
+        if not self.hfss.materials.checkifmaterialexists(sub_name):
+            sub_name = "Custom_Substrate"
+            self._ensure_material(sub_name, float(self.params["er"]), float(self.params["tan_d"]))
+
+        rows = int(self.calculated_params["rows"])
+        cols = int(self.calculated_params["cols"])
+
+        self._apply_design_variables()
+        self.created_ports.clear()
+
+        self.log_message("Creating substrate")
+        substrate = self.hfss.modeler.create_box(["-subW/2", "-subL/2", 0], ["subW", "subL", "h_sub"], "Substrate", sub_name)
+        self.log_message("Creating ground plane")
+        ground = self.hfss.modeler.create_rectangle("XY", ["-subW/2", "-subL/2", 0], ["subW", "subL"], "Ground", "copper")
+
+        self.log_message(f"Creating {rows*cols} patches in {rows}x{cols} configuration")
+        patches = []
+        relx = float(self.params["feed_rel_x"])
+        relx = min(max(relx, 0.0), 1.0)
+        feed_y_rel = 0.02 if self.params["feed_position"] == "edge" else 0.30
+
+        count = 0
+        for r in range(rows):
+            for c in range(cols):
+                count += 1
+                patch_name = f"Patch_{count}"
+                # Posições como expressões de patchW/patchL/spacing: um novo scaling
+                # só precisa atualizar as variáveis, sem recriar objetos/portas.
+                cx = f"({c - (cols - 1) / 2})*(patchW+spacing)"
+                cy = f"({r - (rows - 1) / 2})*(patchL+spacing)"
+                origin = [f"{cx}-patchW/2", f"{cy}-patchL/2", "h_sub"]
+                self.log_message(f"Creating patch {count} at ({r}, {c})")
+                patch = self.hfss.modeler.create_rectangle("XY", origin, ["patchW", "patchL"], patch_name, "copper")
+                patches.append(patch)
+
+                x_feed = f"{cx}+({relx - 0.5})*patchW"
+                y_feed = f"{cy}+({feed_y_rel - 0.5})*patchL"
+
+                # Evitar criar pad com nome inválido
+                pad_name = f"{patch_name}_Pad"
+                pad_name = pad_name.replace(" ", "_")  # Garantir nome válido
+                pad = self.hfss.modeler.create_circle("XY", [x_feed, y_feed, "h_sub"], "a", pad_name, "copper")
+
+                try:
+                    self.hfss.modeler.unite([patch, pad])
+                except Exception as e:
+                    self.log_message(f"Warning: Could not unite patch and pad: {e}")
+                    # Continua mesmo sem unir
+
+                self._create_coax_feed_lumped(ground=ground, substrate=substrate, x_feed=x_feed, y_feed=y_feed, name_prefix=f"P{count}")
+
+        try:
+            names = [ground.name] + [p.name for p in patches]
+            self.hfss.assign_perfecte_to_sheets(names)
+            self.log_message(f"PerfectE assigned to: {names}")
+        except Exception as e:
+            self.log_message(f"PerfectE assignment warning: {e}")
+
+        self.log_message("Creating air region + radiation boundary")
+        lambda0_mm = self.c / (self.params["sweep_start"] * 1e9) * 1000.0
+        pad_mm = float(lambda0_mm) / 4.0
+        region = self.hfss.modeler.create_region([pad_mm]*6, is_percentage=False)
+        self.hfss.assign_radiation_boundary_to_objects(region)
+
+        # Esfera antes do solve (para ter far-field)
+        self._ensure_infinite_sphere("Infinite Sphere1")
+
+        # Setup
+        self.log_message("Creating simulation setup")
+        setup = self.hfss.create_setup(name="Setup1", setup_type="HFSSDriven")
+        setup.props["Frequency"] = f"{self.params['frequency']}GHz"
+        setup.props["MaxDeltaS"] = 0.02
+        try:
+            setup.props["SaveFields"] = False
+            setup.props["SaveRadFields"] = True
+        except Exception:
+            pass
+
+        self.log_message(f"Creating frequency sweep: {self.params['sweep_type']}")
+        stype = self.params["sweep_type"]
+        try:
+            try:
+                sw = setup.get_sweep("Sweep1")
+                if sw:
+                    sw.delete()
+            except Exception:
+                pass
+            if stype == "Discrete":
+                step = float(self.params["sweep_step"])
+                setup.create_linear_step_sweep(unit="GHz", start_frequency=self.params["sweep_start"],
+                                               stop_frequency=self.params["sweep_stop"], step_size=step, name="Sweep1")
+            elif stype == "Fast":
+                setup.create_frequency_sweep(unit="GHz", name="Sweep1",
+                                             start_frequency=self.params["sweep_start"],
+                                             stop_frequency=self.params["sweep_stop"], sweep_type="Fast")
+            else:
+                setup.create_frequency_sweep(unit="GHz", name="Sweep1",
+                                             start_frequency=self.params["sweep_start"],
+                                             stop_frequency=self.params["sweep_stop"], sweep_type="Interpolating")
+        except Exception as e:
+            self.log_message(f"Sweep creation warning: {e}")
+
+        self._built_signature = self._geometry_signature()
+
+    def _run_simulation_thread(self, reuse_geometry: bool = False):
         """Executa a simulação em uma thread separada para não travar a GUI."""
         try:
             self.log_message("Starting simulation thread")
@@ -1441,123 +1680,11 @@ class ModernPatchAntennaDesigner:
             if self.calculated_params["num_patches"] < 1:
                 self.calculate_parameters()
 
-            self._open_or_create_project()
-
-            self.hfss.modeler.model_units = "mm"
-            self.log_message("Model units set to: mm")
-
-            sub_name = self.params["substrate_material"]
-            if not self.hfss.materials.checkifmaterialexists(sub_name):
-                sub_name = "Custom_Substrate"
-                self._ensure_material(sub_name, float(self.params["er"]), float(self.params["tan_d"]))
-
-            L = float(self.calculated_params["patch_length"])
-            W = float(self.calculated_params["patch_width"])
-            spacing = float(self.calculated_params["spacing"])
-            rows = int(self.calculated_params["rows"])
-            cols = int(self.calculated_params["cols"])
-            h_sub = float(self.params["substrate_thickness"])
-            sub_w = float(self.calculated_params["substrate_width"])
-            sub_l = float(self.calculated_params["substrate_length"])
-
-            self._set_design_variables(L, W, spacing, rows, cols, h_sub, sub_w, sub_l)
-            self.created_ports.clear()
-
-            self.log_message("Creating substrate")
-            substrate = self.hfss.modeler.create_box(["-subW/2", "-subL/2", 0], ["subW", "subL", "h_sub"], "Substrate", sub_name)
-            self.log_message("Creating ground plane")
-            ground = self.hfss.modeler.create_rectangle("XY", ["-subW/2", "-subL/2", 0], ["subW", "subL"], "Ground", "copper")
-
-            self.log_message(f"Creating {rows*cols} patches in {rows}x{cols} configuration")
-            patches = []
-            total_w = cols * W + (cols - 1) * spacing
-            total_l = rows * L + (rows - 1) * spacing
-            start_x = -total_w / 2 + W / 2
-            start_y = -total_l / 2 + L / 2
-
-            count = 0
-            for r in range(rows):
-                for c in range(cols):
-                    count += 1
-                    patch_name = f"Patch_{count}"
-                    cx = start_x + c * (W + spacing)
-                    cy = start_y + r * (L + spacing)
-                    origin = [cx - W / 2, cy - L / 2, "h_sub"]
-                    self.log_message(f"Creating patch {count} at ({r}, {c})")
-                    patch = self.hfss.modeler.create_rectangle("XY", origin, ["patchW", "patchL"], patch_name, "copper")
-                    patches.append(patch)
-
-                    if self.params["feed_position"] == "edge":
-                        y_feed = cy - 0.5 * L + 0.02 * L
-                    else:
-                        y_feed = cy - 0.5 * L + 0.30 * L
-                    relx = float(self.params["feed_rel_x"])
-                    relx = min(max(relx, 0.0), 1.0)
-                    x_feed = cx - 0.5 * W + relx * W
-
-                    # Evitar criar pad com nome inválido
-                    pad_name = f"{patch_name}_Pad"
-                    pad_name = pad_name.replace(" ", "_")  # Garantir nome válido
-                    pad = self.hfss.modeler.create_circle("XY", [x_feed, y_feed, "h_sub"], "a", pad_name, "copper")
-                    
-                    try:
-                        self.hfss.modeler.unite([patch, pad])
-                    except Exception as e:
-                        self.log_message(f"Warning: Could not unite patch and pad: {e}")
-                        # Continua mesmo sem unir
-
-                    self._create_coax_feed_lumped(ground=ground, substrate=substrate, x_feed=x_feed, y_feed=y_feed, name_prefix=f"P{count}")
-
-            try:
-                names = [ground.name] + [p.name for p in patches]
-                self.hfss.assign_perfecte_to_sheets(names)
-                self.log_message(f"PerfectE assigned to: {names}")
-            except Exception as e:
-                self.log_message(f"PerfectE assignment warning: {e}")
-
-            self.log_message("Creating air region + radiation boundary")
-            lambda0_mm = self.c / (self.params["sweep_start"] * 1e9) * 1000.0
-            pad_mm = float(lambda0_mm) / 4.0
-            region = self.hfss.modeler.create_region([pad_mm]*6, is_percentage=False)
-            self.hfss.assign_radiation_boundary_to_objects(region)
-
-            # Esfera antes do solve (para ter far-field)
-            self._ensure_infinite_sphere("Infinite Sphere1")
-
-            # Setup
-            self.log_message("Creating simulation setup")
-            setup = self.hfss.create_setup(name="Setup1", setup_type="HFSSDriven")
-            setup.props["Frequency"] = f"{self.params['frequency']}GHz"
-            setup.props["MaxDeltaS"] = 0.02
-            try:
-                setup.props["SaveFields"] = False
-                setup.props["SaveRadFields"] = True
-            except Exception:
-                pass
-
-            self.log_message(f"Creating frequency sweep: {self.params['sweep_type']}")
-            stype = self.params["sweep_type"]
-            try:
-                try:
-                    sw = setup.get_sweep("Sweep1")
-                    if sw:
-                        sw.delete()
-                except Exception:
-                    pass
-                if stype == "Discrete":
-                    step = float(self.params["sweep_step"])
-                    setup.create_linear_step_sweep(unit="GHz", start_frequency=self.params["sweep_start"],
-                                                   stop_frequency=self.params["sweep_stop"], step_size=step, name="Sweep1")
-                elif stype == "Fast":
-                    setup.create_frequency_sweep(unit="GHz", name="Sweep1",
-                                                 start_frequency=self.params["sweep_start"],
-                                                 stop_frequency=self.params["sweep_stop"], sweep_type="Fast")
-                else:
-                    setup.create_frequency_sweep(unit="GHz", name="Sweep1",
-                                                 start_frequency=self.params["sweep_start"],
-                                                 stop_frequency=self.params["sweep_stop"], sweep_type="Interpolating")
-            except Exception as e:
-                self.log_message(f"Sweep creation warning: {e}")
+            if reuse_geometry and self._can_reuse_geometry():
+                self._reanalyze_with_updated_vars()
+            else:
+                self._built_signature = None
+                self._build_geometry()
 
             exs = self._list_excitations()
             self.log_message(f"Excitations created: {len(exs)} -> {exs}")
@@ -1609,7 +1736,7 @@ class ModernPatchAntennaDesigner:
         except Exception as e:
             self.log_message(f"Error updating after simulation: {e}")
 
-    def run_simulation(self):
+    def run_simulation(self, reuse_geometry: bool = False):
         """Inicia a simulação em uma thread separada."""
         if self.simulation_running:
             self.log_message("Simulation is already running")
@@ -1621,7 +1748,7 @@ class ModernPatchAntennaDesigner:
         self.update_quick_status("Running...", "running")
         
         # Executar a simulação em uma thread separada
-        self.simulation_thread = threading.Thread(target=self._run_simulation_thread)
+        self.simulation_thread = threading.Thread(target=self._run_simulation_thread, args=(reuse_geometry,))
         self.simulation_thread.daemon = True
         self.simulation_thread.start()
 
@@ -1699,7 +1826,7 @@ class ModernPatchAntennaDesigner:
             self.ax_s11.grid(True, alpha=0.5)
 
             # VSWR via |S|
-            s_abs = 10 ** (s11_db / 20.0)
+            s_abs = np.exp(s11_db * _LN10_OVER_20)
             s_abs = np.clip(s_abs, 0, 0.999999)
             vswr = (1 + s_abs) / (1 - s_abs)
             ax_v = self.ax_s11.twinx()
@@ -1719,9 +1846,12 @@ class ModernPatchAntennaDesigner:
             Zmag = None; R = X = None
             if reS is not None and imS is not None and reS.size == imS.size == f.size:
                 S = reS + 1j*imS
+                # limita |S| < 1 para que (1 - S) nunca seja zero (sem np.errstate)
+                mag = np.abs(S)
+                safe = mag < 0.9999999
+                S = np.where(safe, S, S * (0.9999999 / np.maximum(mag, 1e-30)))
                 Z0 = 50.0
-                with np.errstate(divide='ignore', invalid='ignore'):
-                    Z = Z0 * (1 + S) / (1 - S)
+                Z = Z0 * (1 + S) / (1 - S)
                 Zmag = np.abs(Z)
                 self.ax_imp.plot(f, Zmag, linewidth=2)
                 self.ax_imp.set_xlabel("Frequency (GHz)")
@@ -1751,92 +1881,141 @@ class ModernPatchAntennaDesigner:
             self.log_message(f"Analyze S11 error: {e}\nTraceback: {traceback.format_exc()}")
 
     # ------------- Padrões / 3D -------------
+    def _pattern_key(self) -> tuple:
+        """Chave do estado dos padrões: frequência, passos 3D e fontes aplicadas."""
+        return (float(self.params["frequency"]), self.params["theta_step"], self.params["phi_step"], self._source_sig)
+
+    def _update_cut_axis(self, ax, key: str, ang, gain, original, label: str, xlabel: str, title: str):
+        """Atualiza um corte reaproveitando os Line2D (Original/atual) em vez de ax.clear()."""
+        lines = self._cut_lines.get(key)
+        if lines is None:
+            ax.clear()
+            orig_line, = ax.plot([], [], '--', linewidth=2, alpha=0.7)
+            cur_line, = ax.plot([], [], linewidth=2)
+            ax.set_xlabel(xlabel); ax.set_ylabel("Gain (dB)")
+            ax.grid(True, alpha=0.5)
+            lines = self._cut_lines[key] = (orig_line, cur_line)
+        orig_line, cur_line = lines
+
+        if original is not None:
+            orig_line.set_data(*original)
+            orig_line.set_label('Original'); orig_line.set_visible(True)
+        else:
+            orig_line.set_label('_Original'); orig_line.set_visible(False)
+        cur_line.set_data(ang, gain)
+        cur_line.set_label(label)
+
+        ax.set_title(title)
+        ax.relim(visible_only=True); ax.autoscale_view()
+        ax.legend()
+
+    def _future_result(self, fut, what: str, default):
+        """Resultado de uma consulta do pool, ou `default` (com log) se ela levantou exceção."""
+        try:
+            return fut.result()
+        except Exception as e:
+            self.log_message(f"{what} query failed: {e}")
+            return default
+
     def refresh_patterns_only(self):
         """Atualiza cortes theta/phi e superfície 3D com base na solução atual."""
+        # descarta a chamada se outra ainda estiver em curso, em vez de enfileirar consultas ao HFSS
+        if not self._refresh_lock.acquire(blocking=False):
+            self.log_message("Refresh already in progress, skipped.")
+            return
         try:
-            # limpa e redesenha cortes
-            self.ax_th.clear(); self.ax_ph.clear(); self.ax_3d.clear()
+            self._refresh_patterns()
+        finally:
+            self._refresh_lock.release()
 
+    def _refresh_patterns(self):
+        """Corpo de refresh_patterns_only; executado com _refresh_lock adquirido."""
+        try:
             f0 = float(self.params["frequency"])
 
-            th, gth = self._get_gain_cut(f0, cut="theta", fixed_angle_deg=0.0)
+            key = self._pattern_key()
+            cached = self._pattern_cache.get(key)
+            if cached is not None:
+                (th, gth), (ph, gph), grid = cached
+            else:
+                # as três consultas ao HFSS são independentes: dispara em paralelo
+                if self._io_pool is None:
+                    self._io_pool = ThreadPoolExecutor(max_workers=3)
+                fut_th = self._io_pool.submit(self._get_gain_cut, f0, cut="theta", fixed_angle_deg=0.0)
+                fut_ph = self._io_pool.submit(self._get_gain_cut, f0, cut="phi", fixed_angle_deg=90.0)
+                fut_3d = self._io_pool.submit(self._get_gain_3d_grid, f0, theta_step=self.params["theta_step"],
+                                              phi_step=self.params["phi_step"])
+                # cada consulta falha sozinha: um corte perdido não descarta os outros dois
+                th, gth = self._future_result(fut_th, "Theta cut", (None, None))
+                ph, gph = self._future_result(fut_ph, "Phi cut", (None, None))
+                grid = self._future_result(fut_3d, "3D grid", None)
+                if gth is not None and gph is not None and grid is not None:
+                    if len(self._pattern_cache) >= 8:
+                        self._pattern_cache.pop(next(iter(self._pattern_cache)))
+                    self._pattern_cache[key] = ((th, gth), (ph, gph), grid)
+
+            label = 'Optimized' if self.optimized else 'Simulated'
+            if self.optimized and len(self.optimization_history) > 0:
+                label += f' (Iteration {len(self.optimization_history)})'
+            suffix = f" (Optimized - Iteration {len(self.optimization_history)})" if self.optimized else ""
+
             if th is not None and gth is not None:
-                # Plotar dados originais se disponíveis
-                if hasattr(self, 'original_theta_data') and self.original_theta_data is not None:
-                    orig_th, orig_gth = self.original_theta_data
-                    self.ax_th.plot(orig_th, orig_gth, '--', label='Original', linewidth=2, alpha=0.7)
-                
-                # Plotar dados atuais
-                label = 'Optimized' if self.optimized else 'Simulated'
-                if self.optimized and len(self.optimization_history) > 0:
-                    label += f' (Iteration {len(self.optimization_history)})'
-                
-                self.ax_th.plot(th, gth, label=label, linewidth=2)
-                self.ax_th.set_xlabel("Theta (deg)"); self.ax_th.set_ylabel("Gain (dB)")
-                
-                title = "Radiation Pattern - Theta cut (Phi=0°)"
-                if self.optimized:
-                    title += f" (Optimized - Iteration {len(self.optimization_history)})"
-                self.ax_th.set_title(title)
-                
-                self.ax_th.legend()
-                self.ax_th.grid(True, alpha=0.5)
-                
+                self._update_cut_axis(self.ax_th, "theta", th, gth, self.original_theta_data, label,
+                                      "Theta (deg)", "Radiation Pattern - Theta cut (Phi=0°)" + suffix)
                 # Armazenar para comparação futura
                 if not self.optimized:
                     self.original_theta_data = (th, gth)
             else:
+                self._cut_lines.pop("theta", None)
+                self.ax_th.clear()
                 self.ax_th.text(0.5, 0.5, "Theta-cut gain not available",
                                 transform=self.ax_th.transAxes, ha="center", va="center")
 
-            ph, gph = self._get_gain_cut(f0, cut="phi", fixed_angle_deg=90.0)
             if ph is not None and gph is not None:
-                # Plotar dados originais se disponíveis
-                if hasattr(self, 'original_phi_data') and self.original_phi_data is not None:
-                    orig_ph, orig_gph = self.original_phi_data
-                    self.ax_ph.plot(orig_ph, orig_gph, '--', label='Original', linewidth=2, alpha=0.7)
-                
-                # Plotar dados atuais
-                label = 'Optimized' if self.optimized else 'Simulated'
-                if self.optimized and len(self.optimization_history) > 0:
-                    label += f' (Iteration {len(self.optimization_history)})'
-                
-                self.ax_ph.plot(ph, gph, label=label, linewidth=2)
-                self.ax_ph.set_xlabel("Phi (deg)"); self.ax_ph.set_ylabel("Gain (dB)")
-                
-                title = "Radiation Pattern - Phi cut (Theta=90°)"
-                if self.optimized:
-                    title += f" (Optimized - Iteration {len(self.optimization_history)})"
-                self.ax_ph.set_title(title)
-                
-                self.ax_ph.legend()
-                self.ax_ph.grid(True, alpha=0.5)
-                
+                self._update_cut_axis(self.ax_ph, "phi", ph, gph, self.original_phi_data, label,
+                                      "Phi (deg)", "Radiation Pattern - Phi cut (Theta=90°)" + suffix)
                 # Armazenar para comparação futura
                 if not self.optimized:
                     self.original_phi_data = (ph, gph)
             else:
+                self._cut_lines.pop("phi", None)
+                self.ax_ph.clear()
                 self.ax_ph.text(0.5, 0.5, "Phi-cut gain not available",
                                 transform=self.ax_ph.transAxes, ha="center", va="center")
 
-            # 3D
-            grid = self._get_gain_3d_grid(f0, theta_step=self.params["theta_step"], phi_step=self.params["phi_step"])
-            if grid is not None:
+            # 3D: a mesma grade (acerto de cache) já está desenhada, não reconstrói a superfície
+            surface_changed = not (grid is not None and grid is self.grid3d and self._surf3d is not None)
+            if grid is not None and surface_changed:
                 TH_deg, PH_deg, Gdb = grid  # shapes (Nt, Np)
                 self.grid3d = grid
-                TH = np.deg2rad(TH_deg)[:, None] * np.ones((1, Gdb.shape[1]))
-                PH = np.deg2rad(PH_deg)[None, :] * np.ones((Gdb.shape[0], 1))
-                # raio proporcional ao ganho linear normalizado
-                Glin = 10 ** (Gdb / 20.0)
-                Glin = Glin - np.min(Glin)
-                if np.max(Glin) > 0:
-                    Glin = Glin / np.max(Glin)
-                R = 0.2 + 0.8 * Glin
-                X = R * np.sin(TH) * np.cos(PH)
-                Y = R * np.sin(TH) * np.sin(PH)
-                Z = R * np.cos(TH)
-                self.ax_3d.plot_surface(X, Y, Z, rstride=1, cstride=1, linewidth=0, antialiased=True,
-                                        cmap=cm.jet, shade=True)
+                # buffers float32 (R, X, Y, Z) reaproveitados enquanto a grade tiver o mesmo shape;
+                # precisão de sobra para o plot e metade do tráfego de memória
+                bufs = self._buf3d.get(Gdb.shape)
+                if bufs is None:
+                    self._buf3d.clear()
+                    bufs = self._buf3d[Gdb.shape] = tuple(np.empty(Gdb.shape, dtype=np.float32) for _ in range(4))
+                R, X, Y, Z = bufs
+                # raio proporcional ao ganho linear normalizado (in-place)
+                np.multiply(Gdb.astype(np.float32, copy=False), np.float32(_LN10_OVER_20), out=R)
+                np.exp(R, out=R)
+                # R <- 0.2 + 0.8*(R - min)/(max - min), como um único multiply-add
+                mn, mx = _minmax(R)
+                if mx > mn:
+                    scale = 0.8 / (mx - mn)
+                    R *= scale
+                    R += 0.2 - mn * scale
+                else:
+                    R.fill(0.2)
+                _spherical_to_xyz(R, np.deg2rad(TH_deg), np.deg2rad(PH_deg), X, Y, Z)
+                # no máximo ~80x80 quads: plot_surface é O(faces) em Python
+                rs = max(1, Gdb.shape[0] // 80); cs = max(1, Gdb.shape[1] // 80)
+                # troca só a superfície; limpa o eixo apenas se não houver uma anterior
+                if self._surf3d is not None:
+                    self._surf3d.remove()
+                else:
+                    self.ax_3d.clear()
+                self._surf3d = self.ax_3d.plot_surface(X, Y, Z, rstride=rs, cstride=cs, linewidth=0,
+                                                       antialiased=True, cmap=cm.jet, shade=True)
                 
                 title = "3D Gain Pattern (normalized)"
                 if self.optimized:
@@ -1844,53 +2023,86 @@ class ModernPatchAntennaDesigner:
                 self.ax_3d.set_title(title)
                 
                 self.ax_3d.set_axis_off()
-            else:
+            elif grid is None:
+                self.ax_3d.clear(); self._surf3d = None
                 self.ax_3d.text2D(0.5, 0.5, "3D pattern not available", transform=self.ax_3d.transAxes, ha="center", va="center")
 
             self.fig.tight_layout()
             self.canvas.draw()
+            self._last_rendered_sig = key
             self.log_message("Patterns refreshed.")
         except Exception as e:
             self.log_message(f"Refresh patterns error: {e}\nTraceback: {traceback.format_exc()}")
 
     # ------------- Beamforming UI -------------
     def populate_source_controls(self, excitations: List[str]):
-        """(Re)constrói controles de potência/fase por porta para beamforming."""
-        for child in self.src_frame.winfo_children():
-            child.destroy()
+        """(Re)constrói controles de potência/fase por porta, reaproveitando linhas já criadas."""
         self.source_controls.clear()
 
         if not excitations:
-            ctk.CTkLabel(self.src_frame, text="No excitations found.").pack(padx=8, pady=6)
+            if self._src_grid is not None:
+                self._src_head.pack_forget(); self._src_grid.pack_forget()
+            if self._src_empty_label is None:
+                self._src_empty_label = ctk.CTkLabel(self.src_frame, text="No excitations found.")
+            self._src_empty_label.pack(padx=8, pady=6)
             return
 
-        head = ctk.CTkFrame(self.src_frame); head.pack(fill="x", padx=8, pady=4)
-        ctk.CTkLabel(head, text="Beamforming & Refresh", font=ctk.CTkFont(weight="bold")).pack(side="left")
-        grid = ctk.CTkFrame(self.src_frame); grid.pack(fill="x", padx=8, pady=6)
-
-        # cabeçalhos
-        ctk.CTkLabel(grid, text="Port", width=120).grid(row=0, column=0, padx=4, pady=4, sticky="w")
-        ctk.CTkLabel(grid, text="Power (W)", width=120).grid(row=0, column=1, padx=4, pady=4)
-        ctk.CTkLabel(grid, text="Phase (deg)", width=300).grid(row=0, column=2, padx=4, pady=4)
+        if self._src_empty_label is not None:
+            self._src_empty_label.pack_forget()
+        if self._src_grid is None:
+            self._src_head = ctk.CTkFrame(self.src_frame)
+            ctk.CTkLabel(self._src_head, text="Beamforming & Refresh", font=ctk.CTkFont(weight="bold")).pack(side="left")
+            self._src_grid = grid = ctk.CTkFrame(self.src_frame)
+
+            # cabeçalhos
+            ctk.CTkLabel(grid, text="Port", width=120).grid(row=0, column=0, padx=4, pady=4, sticky="w")
+            ctk.CTkLabel(grid, text="Power (W)", width=120).grid(row=0, column=1, padx=4, pady=4)
+            ctk.CTkLabel(grid, text="Phase (deg)", width=300).grid(row=0, column=2, padx=4, pady=4)
+            grid.grid_columnconfigure(2, weight=1)
+        self._src_head.pack(fill="x", padx=8, pady=4)
+        self._src_grid.pack(fill="x", padx=8, pady=6)
 
         for i, ex in enumerate(excitations, start=1):
-            row = i
-            ctk.CTkLabel(grid, text=ex.split(":")[0], width=120).grid(row=row, column=0, padx=4, pady=3, sticky="w")
-            p_entry = ctk.CTkEntry(grid, width=100); p_entry.insert(0, "1.0")
-            p_entry.grid(row=row, column=1, padx=4, pady=3)
-            phase_slider = ctk.CTkSlider(grid, from_=0, to=360, number_of_steps=360)
-            phase_slider.set(0); phase_slider.grid(row=row, column=2, padx=6, pady=6, sticky="ew")
-            grid.grid_columnconfigure(2, weight=1)
-            self.source_controls[ex] = {"power": p_entry, "phase": phase_slider}
+            if i > len(self._src_widget_pool):
+                # pool pequeno: cria só as linhas que faltam
+                grid = self._src_grid
+                lbl = ctk.CTkLabel(grid, width=120)
+                lbl.grid(row=i, column=0, padx=4, pady=3, sticky="w")
+                p_entry = ctk.CTkEntry(grid, width=100)
+                p_entry.grid(row=i, column=1, padx=4, pady=3)
+                phase_slider = ctk.CTkSlider(grid, from_=0, to=360, number_of_steps=360,
+                                             command=lambda _v: self._schedule_apply())
+                phase_slider.grid(row=i, column=2, padx=6, pady=6, sticky="ew")
+                self._src_widget_pool.append({"label": lbl, "power": p_entry, "phase": phase_slider})
+            row = self._src_widget_pool[i - 1]
+            row["label"].configure(text=ex.split(":")[0])
+            row["power"].delete(0, "end"); row["power"].insert(0, "1.0")
+            row["phase"].set(0)
+            for w in row.values():
+                w.grid()
+            self.source_controls[ex] = {"power": row["power"], "phase": row["phase"]}
+
+        # linhas excedentes ficam ocultas para reuso futuro
+        for row in self._src_widget_pool[len(excitations):]:
+            for w in row.values():
+                w.grid_remove()
+
+    def _schedule_apply(self, delay_ms: int = 200):
+        """Debounce dos sliders: só o último valor em `delay_ms` chega ao HFSS."""
+        if self._apply_job:
+            self.window.after_cancel(self._apply_job)
+        self._apply_job = self.window.after(delay_ms, self.apply_sources_from_ui)
 
     def apply_sources_from_ui(self):
         """Lê controles de UI and redefine p_i/ph_i + EditSources; atualiza padrões."""
+        self._apply_job = None
         try:
             exs = self._list_excitations()
             if not exs:
                 self.log_message("No excitations to apply.")
                 return
             pvars, phvars = [], []
+            sig = []
             for i, ex in enumerate(exs, start=1):
                 ctrl = self.source_controls.get(ex)
                 if not ctrl:
@@ -1903,7 +2115,9 @@ class ModernPatchAntennaDesigner:
                 self._add_or_set_post_var(f"p{i}", f"{pw}W")
                 self._add_or_set_post_var(f"ph{i}", f"{ph}deg")
                 pvars.append(f"p{i}"); phvars.append(f"ph{i}")
+                sig.append((ex, round(pw, 6), round(ph, 6)))
             self._edit_sources_with_vars(exs, pvars, phvars)
+            self._source_sig = tuple(sig)
             self.refresh_patterns_only()
         except Exception as e:
             self.log_message(f"Apply sources error: {e}\nTraceback: {traceback.format_exc()}")
@@ -1920,7 +2134,10 @@ class ModernPatchAntennaDesigner:
                 self.auto_refresh_job = None
 
     def schedule_auto_refresh(self):
-        self.refresh_patterns_only()
+        # só redesenha se a janela estiver visível, na aba Results, e algo mudou
+        visible = self.window.state() != "iconic" and self.tabview.get() == "Results"
+        if visible and self._pattern_key() != self._last_rendered_sig:
+            self.refresh_patterns_only()
         if self.auto_refresh_var.get():
             self.auto_refresh_job = self.window.after(1500, self.schedule_auto_refresh)
 
@@ -1931,8 +2148,11 @@ class ModernPatchAntennaDesigner:
             if self.last_s11_analysis:
                 f = self.last_s11_analysis["f"]
                 s11 = self.last_s11_analysis["s11_db"]
-                np.savetxt("simulation_results.csv", np.column_stack((f, s11)),
-                           delimiter=",", header="Frequency (GHz), S11 (dB)", comments='')
+                # uma única formatação %-string para todas as linhas (mesmo formato do savetxt)
+                rows = np.column_stack((f, s11)).ravel().tolist()
+                with open("simulation_results.csv", "w", encoding="utf-8", buffering=1 << 16) as fh:
+                    fh.write("Frequency (GHz), S11 (dB)\n")
+                    fh.write(("%.18e,%.18e\n" * (len(rows) // 2)) % tuple(rows))
                 self.log_message("Data exported to simulation_results.csv")
             else:
                 self.log_message("Run 'Analyze S11' first.")
@@ -1943,18 +2163,32 @@ class ModernPatchAntennaDesigner:
         """Exporta figure atual para PNG de alta resolução."""
         try:
             if hasattr(self, 'fig'):
-                self.fig.savefig("simulation_results.png", dpi=300, bbox_inches='tight')
-                self.log_message("Plot saved to simulation_results.png")
+                # renderiza em memória (Agg); a escrita em disco vai para uma thread
+                buf = io.BytesIO()
+                self.fig.savefig(buf, format="png", dpi=300, bbox_inches='tight')
+                threading.Thread(target=self._write_file_bytes,
+                                 args=("simulation_results.png", buf.getvalue(), "Plot saved to simulation_results.png"),
+                                 daemon=True).start()
         except Exception as e:
             self.log_message(f"Error saving plot: {e}")
             
+    def _write_file_bytes(self, path: str, data: bytes, done_msg: str):
+        """Grava bytes em disco (executado fora da thread da GUI)."""
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+            self.log_message(done_msg)
+        except Exception as e:
+            self.log_message(f"Error writing {path}: {e}")
+
     # ------------- Persistência -------------
     def save_parameters(self):
         """Salva parâmetros (usuário + calculados) em JSON."""
         try:
             all_params = {**self.params, **self.calculated_params}
+            # serialização compacta, escrita em uma única chamada
             with open("antenna_parameters.json", "w", encoding="utf-8") as f:
-                json.dump(all_params, f, indent=4, ensure_ascii=False)
+                f.write(json.dumps(all_params, separators=(",", ":"), ensure_ascii=False))
             self.log_message("Parameters saved to antenna_parameters.json")
         except Exception as e:
             self.log_message(f"Error saving parameters: {e}")
@@ -1964,12 +2198,8 @@ class ModernPatchAntennaDesigner:
         try:
             with open("antenna_parameters.json", "r", encoding="utf-8") as f:
                 all_params = json.load(f)
-            for k in self.params:
-                if k in all_params:
-                    self.params[k] = all_params[k]
-            for k in self.calculated_params:
-                if k in all_params:
-                    self.calculated_params[k] = all_params[k]
+            self.params.update({k: all_params[k] for k in self.params.keys() & all_params.keys()})
+            self.calculated_params.update({k: all_params[k] for k in self.calculated_params.keys() & all_params.keys()})
             self.update_interface_from_params()
             self.log_message("Parameters loaded from antenna_parameters.json")
         except FileNotFoundError:
@@ -1980,37 +2210,34 @@ class ModernPatchAntennaDesigner:
     def update_interface_from_params(self):
         """Reflete `self.params` e `self.calculated_params` nos widgets e rótulos."""
         try:
-            for key, widget in self.entries:
-                if key in self.params:
-                    val = self.params[key]
-                    # Widgets armazenados são: CTkEntry OU StringVar/BooleanVar
-                    if isinstance(widget, ctk.CTkEntry):
+            params = self.params
+            for key, widget in self._entry_widgets:
+                if key in params:
+                    text = str(params[key])
+                    # só reescreve o campo se o texto mudou
+                    if widget.get() != text:
                         widget.delete(0, "end")
-                        widget.insert(0, str(val))
-                    elif isinstance(widget, ctk.StringVar):
-                        widget.set(val)
-                    elif isinstance(widget, ctk.BooleanVar):
-                        # 'show_gui' controla 'non_graphical' (inverso)
-                        if key == "show_gui":
-                            widget.set(not self.params["non_graphical"])
-                        else:
-                            widget.set(bool(val))
-
-            self.patches_label.configure(text=f"Number of Patches: {self.calculated_params['num_patches']}")
-            self.rows_cols_label.configure(text=f"Configuration: {self.calculated_params['rows']} x {self.calculated_params['cols']}")
-            self.spacing_label.configure(
-                text=f"Spacing: {self.calculated_params['spacing']:.2f} mm ({self.params['spacing_type']})"
-            )
-            self.dimensions_label.configure(
-                text=f"Patch Dimensions: {self.calculated_params['patch_length']:.2f} x "
-                     f"{self.calculated_params['patch_width']:.2f} mm"
-            )
-            self.lambda_label.configure(text=f"Guided Wavelength: {self.calculated_params['lambda_g']:.2f} mm")
-            self.feed_offset_label.configure(text=f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
-            self.substrate_dims_label.configure(
-                text=f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x "
-                     f"{self.calculated_params['substrate_length']:.2f} mm"
-            )
+                        widget.insert(0, text)
+            for key, var in self._stringvar_widgets:
+                if key in params:
+                    var.set(params[key])
+            for key, var in self._boolvar_widgets:
+                if key in params:
+                    # 'show_gui' controla 'non_graphical' (inverso)
+                    var.set(not params["non_graphical"] if key == "show_gui" else bool(params[key]))
+
+            self._set_label(self.patches_label, "patches", f"Number of Patches: {self.calculated_params['num_patches']}")
+            self._set_label(self.rows_cols_label, "rows_cols", f"Configuration: {self.calculated_params['rows']} x {self.calculated_params['cols']}")
+            self._set_label(self.spacing_label, "spacing",
+                            f"Spacing: {self.calculated_params['spacing']:.2f} mm ({self.params['spacing_type']})")
+            self._set_label(self.dimensions_label, "dimensions",
+                            f"Patch Dimensions: {self.calculated_params['patch_length']:.2f} x "
+                            f"{self.calculated_params['patch_width']:.2f} mm")
+            self._set_label(self.lambda_label, "lambda", f"Guided Wavelength: {self.calculated_params['lambda_g']:.2f} mm")
+            self._set_label(self.feed_offset_label, "feed_offset", f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
+            self._set_label(self.substrate_dims_label, "substrate_dims",
+                            f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x "
+                            f"{self.calculated_params['substrate_length']:.2f} mm")
             self.log_message("Interface updated with loaded parameters")
         except Exception as e:
             self.log_message(f"Error updating interface: {e}")
@@ -2019,6 +2246,9 @@ class ModernPatchAntennaDesigner:
     def cleanup(self):
         """Fecha projeto/desktop e limpa temporários com segurança."""
         try:
+            if self._io_pool:
+                self._io_pool.shutdown(wait=False)
+                self._io_pool = None
             if self.hfss:
                 try:
                     if self.save_project:
@@ -12,51 +12,174 @@ Implementações e Correções Finais:
 """
 
 import os
-import re
 import tempfile
 from datetime import datetime
 import math
 import json
+import logging
 import traceback
-import queue
 import threading
+import time
+from collections import deque
+from functools import lru_cache
 from typing import Tuple, List, Optional, Dict, Any
 
 import numpy as np
 import matplotlib
 matplotlib.use("TkAgg")
 import matplotlib.pyplot as plt
-from matplotlib import cm
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from mpl_toolkits.mplot3d import Axes3D
 import customtkinter as ctk
 from tkinter import messagebox, ttk
+from tkinter.filedialog import asksaveasfilename
 
-from ansys.aedt.core import Desktop, Hfss
+# PyAEDT é importado sob demanda (_lazy_aedt) na primeira simulação: o import leva segundos
+Desktop = Hfss = None
+
+
+def _lazy_aedt():
+    """Importa Desktop/Hfss do PyAEDT na primeira chamada."""
+    global Desktop, Hfss
+    if Hfss is None:
+        from ansys.aedt.core import Desktop, Hfss
 
 # ---------- Aparência ----------
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+def _to_int(val) -> int:
+    """Inteiro a partir do texto do campo; aceita "4.0" como o casting antigo via float."""
+    return int(float(val))
+
+# ---------- Rótulos de parâmetros calculados ----------
+# (atributo do rótulo, template já ligado a format_map sobre calculated_params)
+_CALC_LABELS = tuple((name, tpl.format_map) for name, tpl in (
+    ("patches_label", "Number of Patches: {num_patches}"),
+    ("rows_cols_label", "Configuration: {rows} x {cols}"),
+    ("spacing_label", "Spacing: {spacing:.2f} mm"),
+    ("dimensions_label", "Patch Dimensions: {patch_length:.2f} x {patch_width:.2f} mm"),
+    ("lambda_label", "Guided Wavelength: {lambda_g:.2f} mm"),
+    ("feed_offset_label", "Feed Offset (y): {feed_offset:.2f} mm"),
+    ("substrate_dims_label", "Substrate Dimensions: {substrate_width:.2f} x {substrate_length:.2f} mm"),
+))
+
+# ---------- Campos da aba Design ----------
+# (título, descrição, linha, coluna, ((rótulo, chave, unidade, combo, check), ...))
+_DESIGN_SECTIONS = (
+    ("Antenna Parameters", "Fundamental design parameters", 0, 0, (
+        ("Frequency", "frequency", "GHz", None, False),
+        ("Gain", "gain", "dBi", None, False),
+        ("Sweep Start", "sweep_start", "GHz", None, False),
+        ("Sweep Stop", "sweep_stop", "GHz", None, False),
+        ("Patch Spacing", "spacing_type", "", ("lambda/2", "lambda", "0.7*lambda", "0.8*lambda", "0.9*lambda"), False),
+    )),
+    ("Substrate Parameters", "Material properties", 0, 1, (
+        ("Substrate Material", "substrate_material", "", ("Duroid (tm)", "Rogers RO4003C (tm)", "FR4_epoxy", "Air"), False),
+        ("Er", "er", "", None, False),
+        ("Tan D", "tan_d", "", None, False),
+        ("Substrate Thickness", "substrate_thickness", "mm", None, False),
+        ("Metal Thickness", "metal_thickness", "mm", None, False),
+    )),
+    ("Feed Parameters", "Coaxial feed configuration", 1, 0, (
+        ("Feed Position Type", "feed_position", "", ("inset", "edge"), False),
+        ("Feed Rel X", "feed_rel_x", "", None, False),
+        ("Coax Ba Ratio", "coax_ba_ratio", "", None, False),
+        ("Probe Radius", "probe_radius", "mm", None, False),
+        ("Coax Wall Thickness", "coax_wall_thickness", "mm", None, False),
+        ("Coax Port Length", "coax_port_length", "mm", None, False),
+        ("Antipad Clearance", "antipad_clearance", "mm", None, False),
+    )),
+    ("Simulation Settings", "Solution configuration", 1, 1, (
+        ("CPU Cores", "cores", "", None, False),
+        ("Show HFSS UI", "show_gui", "", None, True),
+        ("Save Project", "save_project", "", None, True),
+        ("Sweep Type", "sweep_type", "", ("Discrete", "Interpolating", "Fast"), False),
+        ("Discrete Step", "sweep_step", "GHz", None, False),
+        ("3D Theta Step", "theta_step", "deg", None, False),
+        ("3D Phi Step", "phi_step", "deg", None, False),
+    )),
+)
+
+
+def _best_layout(n: int) -> Tuple[int, int]:
+    """Layout quase quadrado (linhas, colunas) com pelo menos n elementos, só com inteiros."""
+    r = math.isqrt(n)
+    return r, (n + r - 1) // r
+
+
+# Layouts pré-calculados para até 1023 elementos
+_LAYOUT_LUT = {n: _best_layout(n) for n in range(1, 1024)}
+
+
+def _patch_dims_array(frequency_ghz, er, h_mm, c: float):
+    """L, W e λg (em mm) para microfita retangular; aceita escalares ou arrays (varreduras)."""
+    f = np.asarray(frequency_ghz, dtype=float) * 1e9
+    er = np.asarray(er, dtype=float)
+    h = np.asarray(h_mm, dtype=float) / 1000.0  # mm->m
+    W = c / (2 * f) * np.sqrt(2 / (er + 1))
+    eeff = (er + 1) / 2 + (er - 1) / 2 * (1 + 12 * h / W) ** -0.5
+    dL = 0.412 * h * ((eeff + 0.3) * (W / h + 0.264)) / ((eeff - 0.258) * (W / h + 0.8))
+    sqrt_eeff = np.sqrt(eeff)
+    L = c / (2 * f * sqrt_eeff) - 2 * dL
+    lambda_g = c / (f * sqrt_eeff)
+    return L * 1000.0, W * 1000.0, lambda_g * 1000.0
+
+
+@lru_cache(maxsize=128)
+def _patch_dims(frequency_ghz: float, er: float, h_mm: float, c: float) -> Tuple[float, float, float]:
+    """Versão escalar memoizada de _patch_dims_array, por (f, εr, h, c)."""
+    L, W, lambda_g = _patch_dims_array(frequency_ghz, er, h_mm, c)
+    return (float(L), float(W), float(lambda_g))
+
 
 class ModernPatchAntennaDesigner:
     """Aplicativo GUI para dimensionamento e simulação de patch array em HFSS."""
 
+    # Todos os atributos de instância; um novo atributo precisa ser declarado aqui
+    __slots__ = (
+        # AEDT / runtime
+        "hfss", "desktop", "temp_folder", "project_path", "project_display_name", "design_base_name",
+        "log_queue", "_log_level", "_log_ts", "_debug", "save_project", "created_ports",
+        "simulation_running", "_closing", "_known_materials",
+        # dados, otimização e parâmetros
+        "last_s11_analysis", "theta_cut", "phi_cut", "grid3d", "auto_refresh_job",
+        "original_params", "optimized", "optimization_history", "original_s11_data",
+        "original_theta_data", "original_phi_data", "params", "calculated_params", "_calc_cache", "c",
+        # widgets
+        "window", "quick_status", "tabview", "status_label", "entries", "_schema",
+        "patches_label", "rows_cols_label", "spacing_label", "dimensions_label", "lambda_label",
+        "feed_offset_label", "substrate_dims_label", "run_button", "_sim_status_var", "sim_status_label",
+        "fig", "ax_s11", "ax_imp", "ax_th", "ax_ph", "ax_3d", "canvas", "src_frame", "source_controls",
+        "auto_refresh_var", "result_label", "opt_status_label", "history_frame", "log_text", "current_tooltip",
+    )
+
+    # Fator de espaçamento entre patches (em λ0) por opção da UI
+    _SPACING_FACTORS = {"lambda/2": 0.5, "lambda": 1.0, "0.7*lambda": 0.7, "0.8*lambda": 0.8, "0.9*lambda": 0.9}
+
     # ---------------- Inicialização ----------------
     def __init__(self):
         # AEDT
-        self.hfss: Optional[Hfss] = None
-        self.desktop: Optional[Desktop] = None
+        self.hfss: Optional["Hfss"] = None
+        self.desktop: Optional["Desktop"] = None
         self.temp_folder = None
         self.project_path = ""
         self.project_display_name = "patch_array"
         self.design_base_name = "patch_array"
 
         # Runtime
-        self.log_queue = queue.Queue()
+        # deque: append/popleft já são atômicos no CPython; basta para um produtor/consumidor sem bloqueio
+        self.log_queue = deque()
+        # Mensagens de log_debug só são formatadas com nível DEBUG
+        # ANT_DEBUG=1 liga as mensagens de debug e os tracebacks completos nos erros
+        self._debug = bool(os.environ.get("ANT_DEBUG"))
+        self._log_level = logging.DEBUG if self._debug else logging.INFO
+        self._log_ts = (0, "")
         self.save_project = False
         self.created_ports: List[str] = []
         self.simulation_running = False
+        self._closing = False
+        # Materiais já confirmados na sessão AEDT atual (evita RPCs repetidas)
+        self._known_materials: set = set()
 
         # Dados em memória
         self.last_s11_analysis = None
@@ -90,6 +213,8 @@ class ModernPatchAntennaDesigner:
             "rows": 2, "cols": 2, "lambda_g": 0.0, "feed_offset": 2.0,
             "substrate_width": 0.0, "substrate_length": 0.0
         }
+        # Resultados de calculate_parameters por (freq, er, h, gain, spacing_type)
+        self._calc_cache: Dict[tuple, Dict[str, Any]] = {}
 
         self.c = 299792458.0
         self.setup_gui()
@@ -190,9 +315,11 @@ class ModernPatchAntennaDesigner:
         main.grid_columnconfigure(0, weight=1)
         main.grid_columnconfigure(1, weight=1)
 
-        sec_ant = self.create_section(main, "Antenna Parameters", "Fundamental design parameters", 0, 0)
         self.entries = []
-        row_idx = 2
+        # conversor de cada campo (str/bool/int/float), definido ao criar o widget
+        self._schema: Dict[str, Any] = {}
+        # uma única fonte compartilhada por todos os rótulos (CTkFont exige a janela já criada)
+        label_font = ctk.CTkFont(weight="bold")
 
         def add_entry(section, label, key, value, row, tooltip=None, combo=None, check=False, unit=""):
             field_frame = ctk.CTkFrame(section, fg_color="transparent")
@@ -200,7 +327,7 @@ class ModernPatchAntennaDesigner:
             field_frame.grid_columnconfigure(1, weight=1)
 
             label_text = f"{label} ({unit}):" if unit else f"{label}:"
-            lbl = ctk.CTkLabel(field_frame, text=label_text, font=ctk.CTkFont(weight="bold"), 
+            lbl = ctk.CTkLabel(field_frame, text=label_text, font=label_font, 
                                anchor="w", text_color=("gray30", "gray70"))
             lbl.grid(row=0, column=0, sticky="w", padx=(0, 10))
 
@@ -208,6 +335,7 @@ class ModernPatchAntennaDesigner:
             widget_frame.grid(row=0, column=1, sticky="ew")
             widget_frame.grid_columnconfigure(0, weight=1)
             
+            self._schema[key] = str if combo else bool if check else _to_int if type(value) is int else type(value)
             if combo:
                 var = ctk.StringVar(value=value)
                 widget = ctk.CTkComboBox(widget_frame, values=combo, variable=var)
@@ -230,53 +358,17 @@ class ModernPatchAntennaDesigner:
                 info_btn.bind("<Enter>", lambda e, t=tooltip: self.show_tooltip(e, t))
                 info_btn.bind("<Leave>", self.hide_tooltip)
 
-        # Parâmetros de Antena
-        row_idx = 2
-        for p, d in [("frequency", "GHz"), ("gain", "dBi"), ("sweep_start", "GHz"), ("sweep_stop", "GHz")]:
-            add_entry(sec_ant, p.replace("_", " ").title(), p, self.params[p], row_idx, unit=d)
-            row_idx += 1
-        add_entry(sec_ant, "Patch Spacing", "spacing_type", self.params["spacing_type"], row_idx, combo=["lambda/2", "lambda", "0.7*lambda", "0.8*lambda", "0.9*lambda"])
-
-        # Parâmetros de Substrato
-        sec_sub = self.create_section(main, "Substrate Parameters", "Material properties", 0, 1)
-        row_idx = 2
-        add_entry(sec_sub, "Substrate Material", "substrate_material", self.params["substrate_material"], row_idx, combo=["Duroid (tm)", "Rogers RO4003C (tm)", "FR4_epoxy", "Air"])
-        row_idx += 1
-        for p in ["er", "tan_d"]:
-             add_entry(sec_sub, p.replace("_", " ").title(), p, self.params[p], row_idx)
-             row_idx += 1
-        for p, d in [("substrate_thickness", "mm"), ("metal_thickness", "mm")]:
-            add_entry(sec_sub, p.replace("_", " ").title(), p, self.params[p], row_idx, unit=d)
-            row_idx += 1
-
-        # Parâmetros de Alimentação
-        sec_coax = self.create_section(main, "Feed Parameters", "Coaxial feed configuration", 1, 0)
-        row_idx = 2
-        add_entry(sec_coax, "Feed Position Type", "feed_position", self.params["feed_position"], row_idx, combo=["inset", "edge"])
-        row_idx += 1
-        for p in ["feed_rel_x", "coax_ba_ratio"]:
-            add_entry(sec_coax, p.replace("_", " ").title(), p, self.params[p], row_idx)
-            row_idx += 1
-        for p, d in [("probe_radius", "mm"), ("coax_wall_thickness", "mm"), ("coax_port_length", "mm"), ("antipad_clearance", "mm")]:
-            add_entry(sec_coax, p.replace("_", " ").title(), p, self.params[p], row_idx, unit=d)
-            row_idx += 1
-            
-        # Configurações de Simulação
-        sec_sim = self.create_section(main, "Simulation Settings", "Solution configuration", 1, 1)
-        row_idx = 2
-        add_entry(sec_sim, "CPU Cores", "cores", self.params["cores"], row_idx)
-        row_idx += 1
-        add_entry(sec_sim, "Show HFSS UI", "show_gui", not self.params["non_graphical"], row_idx, check=True)
-        row_idx += 1
-        add_entry(sec_sim, "Save Project", "save_project", self.save_project, row_idx, check=True)
-        row_idx += 1
-        add_entry(sec_sim, "Sweep Type", "sweep_type", self.params["sweep_type"], row_idx, combo=["Discrete", "Interpolating", "Fast"])
-        row_idx += 1
-        add_entry(sec_sim, "Discrete Step", "sweep_step", self.params["sweep_step"], row_idx, unit="GHz")
-        row_idx += 1
-        for p, d in [("theta_step", "deg"), ("phi_step", "deg")]:
-            add_entry(sec_sim, f"3D {p.split('_')[0].title()} Step", p, self.params[p], row_idx, unit=d)
-            row_idx += 1
+        # Seções e campos a partir da tabela declarativa, numa única passada
+        for title, description, sec_row, sec_col, fields in _DESIGN_SECTIONS:
+            section = self.create_section(main, title, description, sec_row, sec_col)
+            for row_idx, (label, key, unit, combo, check) in enumerate(fields, start=2):
+                if key == "show_gui":
+                    value = not self.params["non_graphical"]
+                elif key == "save_project":
+                    value = self.save_project
+                else:
+                    value = self.params[key]
+                add_entry(section, label, key, value, row_idx, combo=list(combo) if combo else None, check=check, unit=unit)
 
         # Parâmetros Calculados
         sec_calc = self.create_section(main, "Calculated Parameters", "Derived design values", 2, 0, colspan=2)
@@ -332,7 +424,9 @@ class ModernPatchAntennaDesigner:
         status_frame.grid(row=4, column=0, sticky="ew", padx=15, pady=10)
         status_frame.grid_columnconfigure(0, weight=1)
         
-        self.sim_status_label = ctk.CTkLabel(status_frame, text="Simulation not started", 
+        # a thread de simulação escreve direto na variável; o rótulo a observa
+        self._sim_status_var = ctk.StringVar(value="Simulation not started")
+        self.sim_status_label = ctk.CTkLabel(status_frame, textvariable=self._sim_status_var, 
                                              font=ctk.CTkFont(weight="bold"), text_color=("gray30", "gray70"))
         self.sim_status_label.grid(row=0, column=0, padx=15, pady=12)
 
@@ -352,8 +446,11 @@ class ModernPatchAntennaDesigner:
         graph_frame.grid_columnconfigure(0, weight=1)
         graph_frame.grid_rowconfigure(0, weight=1)
 
-        face = '#2B2B2B' if ctk.get_appearance_mode() == "Dark" else '#FFFFFF'
-        self.fig = plt.figure(figsize=(14, 10), facecolor=face)
+        from mpl_toolkits.mplot3d import Axes3D  # noqa: F401 (registra a projeção '3d')
+
+        # tema aplicado via rcParams antes de criar os eixos (sobrevive também a ax.clear())
+        matplotlib.rcParams.update(self._plot_theme())
+        self.fig = plt.figure(figsize=(14, 10))
         gs = self.fig.add_gridspec(3, 2, height_ratios=[1, 1, 1.3], hspace=0.35, wspace=0.25)
         
         self.ax_s11 = self.fig.add_subplot(gs[0, 0])
@@ -443,35 +540,23 @@ class ModernPatchAntennaDesigner:
         ctk.CTkButton(btn_frame, text="Save Log", command=self.save_log).grid(row=0, column=1, padx=8, sticky="ew")
 
     # ------------- Utilitários de GUI e Estilo -------------
-    def _style_plots(self):
-        """Aplica estilo dinâmico aos gráficos Matplotlib baseado no tema CTk."""
+    @staticmethod
+    def _plot_theme() -> Dict[str, Any]:
+        """rcParams do Matplotlib correspondentes ao tema CTk atual."""
         is_dark = ctk.get_appearance_mode() == "Dark"
         face_color = '#2B2B2B' if is_dark else '#FFFFFF'
         text_color = 'white' if is_dark else 'black'
         grid_color = '#404040' if is_dark else '#D3D3D3'
+        return {
+            'figure.facecolor': face_color, 'axes.facecolor': face_color,
+            'axes.edgecolor': text_color, 'axes.labelcolor': text_color, 'axes.titlecolor': text_color,
+            'xtick.color': text_color, 'ytick.color': text_color, 'text.color': text_color,
+            'axes.grid': True, 'grid.color': grid_color, 'grid.linestyle': '--', 'grid.linewidth': 0.5,
+        }
 
-        self.fig.patch.set_facecolor(face_color)
-        for ax in [self.ax_s11, self.ax_imp, self.ax_th, self.ax_ph]:
-            ax.set_facecolor(face_color)
-            ax.tick_params(colors=text_color, which='both')
-            ax.xaxis.label.set_color(text_color)
-            ax.yaxis.label.set_color(text_color)
-            ax.title.set_color(text_color)
-            for spine in ax.spines.values():
-                spine.set_edgecolor(text_color)
-            ax.grid(True, color=grid_color, linestyle='--', linewidth=0.5)
-        
-        self.ax_3d.set_facecolor(face_color)
-        self.ax_3d.tick_params(colors=text_color, which='both')
-        self.ax_3d.xaxis.label.set_color(text_color)
-        self.ax_3d.yaxis.label.set_color(text_color)
-        self.ax_3d.zaxis.label.set_color(text_color)
-        self.ax_3d.title.set_color(text_color)
-        
-        # Remove os painéis cinza do eixo 3D
-        self.ax_3d.xaxis.set_pane_color((0, 0, 0, 0))
-        self.ax_3d.yaxis.set_pane_color((0, 0, 0, 0))
-        self.ax_3d.zaxis.set_pane_color((0, 0, 0, 0))
+    def _style_plots(self):
+        """Ajustes que o rcParams não cobre: remove os painéis cinza do eixo 3D."""
+        plt.setp((self.ax_3d.xaxis, self.ax_3d.yaxis, self.ax_3d.zaxis), pane_color=(0, 0, 0, 0))
 
 
     def _style_ttk_treeview(self):
@@ -571,14 +656,22 @@ class ModernPatchAntennaDesigner:
         for col in columns:
             tree.column(col, width=130, anchor='center')
         
-        for record in self.optimization_history:
-            tree.insert("", "end", values=(
-                record["iteration"], f"{record['resonant_freq']:.3f}", f"{record['target_freq']:.3f}",
-                f"{record['error_percent']:.1f}", f"{record['min_s11']:.2f}", f"{record['scaling_factor']:.4f}"
-            ))
+        # insere com o TreeView fora do layout: um único relayout ao final
+        tree.grid_remove()
+        try:
+            for values in list(self._history_rows()):
+                tree.insert("", "end", values=values)
+        finally:
+            tree.grid()
         
         ctk.CTkButton(history_window, text="Close", command=history_window.destroy).pack(pady=10)
 
+    def _history_rows(self):
+        """Gera as linhas formatadas do histórico de otimização para o TreeView."""
+        return ((str(r["iteration"]), f"{r['resonant_freq']:.3f}", f"{r['target_freq']:.3f}",
+                 f"{r['error_percent']:.1f}", f"{r['min_s11']:.2f}", f"{r['scaling_factor']:.4f}")
+                for r in self.optimization_history)
+
     def update_quick_status(self, status, color=None):
         """Atualiza o status rápido no header."""
         colors = { "ready": ("gray85", "gray25"), "running": ("#FFA500", "#CC8400"),
@@ -590,31 +683,57 @@ class ModernPatchAntennaDesigner:
     # ------------- Utilitários de Log -------------
     def log_message(self, message: str):
         """Enfileira uma mensagem para o textbox de log com carimbo de hora."""
-        self.log_queue.put(f"[{datetime.now().strftime('%H:%M:%S')}] {message}\n")
+        # o carimbo só é reformatado quando o segundo muda (rajadas de log reutilizam o mesmo)
+        t = int(time.time())
+        if t != self._log_ts[0]:
+            self._log_ts = (t, time.strftime("%H:%M:%S", time.localtime(t)))
+        self.log_queue.append(f"[{self._log_ts[1]}] {message}\n")
+
+    def log_debug(self, fmt: str, *args):
+        """Como log_message, mas descartada (sem formatar `fmt % args`) fora do nível DEBUG."""
+        if self._log_level > logging.DEBUG:
+            return
+        self.log_message(fmt % args if args else fmt)
+
+    def _exc_detail(self, e: Exception) -> str:
+        """Traceback completo com ANT_DEBUG; caso contrário só o tipo da exceção (barato)."""
+        return traceback.format_exc() if self._debug else type(e).__name__
 
     def process_log_queue(self):
         """Consumidor assíncrono da fila de log; mantém UI responsiva."""
+        buf = []
+        try:
+            # drena em lote e faz um único insert/see por ciclo
+            while len(buf) < 500:
+                buf.append(self.log_queue.popleft())
+        except IndexError:
+            pass
         try:
-            while not self.log_queue.empty():
-                msg = self.log_queue.get_nowait()
-                self.log_text.insert("end", msg)
+            if buf:
+                self.log_text.insert("end", "".join(buf))
                 self.log_text.see("end")
         finally:
             if self.window.winfo_exists():
-                self.window.after(100, self.process_log_queue)
+                # lote cheio: ainda há mensagens, continua assim que a UI ficar ociosa
+                if len(buf) >= 500:
+                    self.window.after_idle(self.process_log_queue)
+                else:
+                    self.window.after(100, self.process_log_queue)
 
     def clear_log(self):
         self.log_text.delete("1.0", "end")
         self.log_message("Log cleared.")
 
     def save_log(self):
-        from tkinter.filedialog import asksaveasfilename
         filepath = asksaveasfilename(defaultextension=".log", filetypes=[("Log files", "*.log"), ("All files", "*.*")],
                                      initialfile=f"log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
         if not filepath: return
         try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(self.log_text.get("1.0", "end"))
+            # copia o textbox em blocos de 1000 linhas, sem materializar o log inteiro numa string
+            last_line = int(self.log_text.index("end-1c").split(".")[0])
+            with open(filepath, "w", encoding="utf-8", buffering=1 << 20) as f:
+                for i in range(1, last_line + 1, 1000):
+                    f.write(self.log_text.get(f"{i}.0", f"{i + 1000}.0"))
             self.log_message(f"Log saved to {filepath}")
         except Exception as e:
             self.log_message(f"Error saving log: {e}")
@@ -623,21 +742,16 @@ class ModernPatchAntennaDesigner:
     def get_parameters(self) -> bool:
         """Lê valores da UI, faz casting e sincroniza `self.params`."""
         try:
-            for key, var in self.entries:
-                if key == "show_gui":
-                    self.params["non_graphical"] = not var.get()
-                elif key == "save_project":
-                    self.save_project = var.get()
-                elif isinstance(var, ctk.BooleanVar):
-                     self.params[key] = var.get()
-                elif isinstance(var, ctk.StringVar):
-                    value_str = var.get()
-                    # Tenta converter para float, depois int, e se falhar, mantém como string
-                    try:
-                        if '.' in value_str: self.params[key] = float(value_str)
-                        else: self.params[key] = int(value_str)
-                    except ValueError:
-                        self.params[key] = value_str # Para ComboBoxes
+            # uma única leitura por variável Tk, depois conversão pelo schema do campo
+            vals = {key: var.get() for key, var in self.entries}
+            self.params["non_graphical"] = not vals.pop("show_gui")
+            self.save_project = vals.pop("save_project")
+            schema = self._schema
+            for key, val in vals.items():
+                try:
+                    self.params[key] = schema[key](val)
+                except ValueError as e:
+                    raise ValueError(f"{key} = {val!r}: {e}") from e
             return True
         except Exception as e:
             self.log_message(f"Invalid value detected: {e}")
@@ -646,27 +760,40 @@ class ModernPatchAntennaDesigner:
 
     def calculate_patch_dimensions(self, frequency_ghz: float, er: float, h_mm: float) -> Tuple[float, float, float]:
         """Calcula L, W e λg (em mm) para microfita retangular."""
-        f = frequency_ghz * 1e9
-        h = h_mm / 1000.0  # mm->m
-        W = self.c / (2 * f) * math.sqrt(2 / (er + 1))
-        eeff = (er + 1) / 2 + (er - 1) / 2 * (1 + 12 * h / W) ** -0.5
-        dL = 0.412 * h * ((eeff + 0.3) * (W / h + 0.264)) / ((eeff - 0.258) * (W / h + 0.8))
-        L_eff = self.c / (2 * f * math.sqrt(eeff))
-        L = L_eff - 2 * dL
-        lambda_g = self.c / (f * math.sqrt(eeff))
-        return (L * 1000.0, W * 1000.0, lambda_g * 1000.0)
-
-    def _size_array_from_gain(self) -> Tuple[int, int]:
-        """Deriva nº de elementos (linhas/colunas) a partir do gain desejado."""
+        return _patch_dims(frequency_ghz, er, h_mm, self.c)
+
+    def _size_array_from_gain(self) -> Tuple[int, int, float]:
+        """Deriva nº de elementos (linhas/colunas, N requerido) a partir do gain desejado."""
         G_elem_dBi = 7.0  # Ganho típico de um único patch em dBi
         G_des_dBi = self.params["gain"]
         N_req = 10 ** ((G_des_dBi - G_elem_dBi) / 10.0)
         
-        if N_req <= 1: return 1, 1
+        if N_req <= 1: return 1, 1, N_req
         
-        rows = int(round(math.sqrt(N_req)))
-        cols = int(math.ceil(N_req / rows))
-        return rows, cols
+        n = math.ceil(N_req)
+        rows, cols = _LAYOUT_LUT.get(n) or _best_layout(n)
+        return rows, cols, N_req
+
+    def _compute_calculated_params(self) -> Dict[str, Any]:
+        """Núcleo numérico de calculate_parameters: dimensões, spacing, layout e substrato."""
+        L_mm, W_mm, lambda_g_mm = self.calculate_patch_dimensions(
+            self.params["frequency"], self.params["er"], self.params["substrate_thickness"]
+        )
+        lambda0_m = self.c / (self.params["frequency"] * 1e9)
+        spacing_mm = self._SPACING_FACTORS.get(self.params["spacing_type"], 0.5) * lambda0_m * 1000.0
+
+        rows, cols, N_req = self._size_array_from_gain()
+        num_patches = rows * cols
+        self.log_message(f"Array sizing -> target gain {self.params['gain']} dBi, N_req≈{N_req:.2f}, layout {rows}x{cols} ({num_patches} patches)")
+
+        # (largura, comprimento) do array e do substrato numa só expressão vetorial
+        footprint = np.array([cols, rows]) * np.array([W_mm, L_mm]) + (np.array([cols, rows]) - 1) * spacing_mm
+        substrate_w, substrate_l = (footprint + footprint.max() * 0.20).tolist()
+        return {
+            "patch_length": L_mm, "patch_width": W_mm, "lambda_g": lambda_g_mm, "spacing": spacing_mm,
+            "num_patches": num_patches, "rows": rows, "cols": cols, "feed_offset": 0.30 * L_mm,
+            "substrate_width": substrate_w, "substrate_length": substrate_l
+        }
 
     def calculate_parameters(self):
         """Calcula L/W/λg, spacing e layout (linhas/colunas). Atualiza UI."""
@@ -676,60 +803,48 @@ class ModernPatchAntennaDesigner:
             return
 
         try:
-            L_mm, W_mm, lambda_g_mm = self.calculate_patch_dimensions(
-                self.params["frequency"], self.params["er"], self.params["substrate_thickness"]
-            )
-            self.calculated_params.update({"patch_length": L_mm, "patch_width": W_mm, "lambda_g": lambda_g_mm})
-            
-            lambda0_m = self.c / (self.params["frequency"] * 1e9)
-            factors = {"lambda/2": 0.5, "lambda": 1.0, "0.7*lambda": 0.7, "0.8*lambda": 0.8, "0.9*lambda": 0.9}
-            spacing_mm = factors.get(self.params["spacing_type"], 0.5) * lambda0_m * 1000.0
-            self.calculated_params["spacing"] = spacing_mm
-            
-            rows, cols = self._size_array_from_gain()
-            num_patches = rows * cols
-            self.calculated_params.update({"num_patches": num_patches, "rows": rows, "cols": cols})
-            self.log_message(f"Array sizing -> target gain {self.params['gain']} dBi, N_req≈{10**((self.params['gain']-7)/10):.2f}, layout {rows}x{cols} ({num_patches} patches)")
-            
-            self.calculated_params["feed_offset"] = 0.30 * L_mm
-            
-            total_w = cols * W_mm + (cols - 1) * spacing_mm
-            total_l = rows * L_mm + (rows - 1) * spacing_mm
-            margin = max(total_w, total_l) * 0.20
-            self.calculated_params["substrate_width"] = total_w + margin
-            self.calculated_params["substrate_length"] = total_l + margin
+            key = (self.params["frequency"], self.params["er"], self.params["substrate_thickness"],
+                   self.params["gain"], self.params["spacing_type"])
+            calc = self._calc_cache.get(key)
+            if calc is None:
+                calc = self._compute_calculated_params()
+                if len(self._calc_cache) >= 64:
+                    self._calc_cache.pop(next(iter(self._calc_cache)))
+                self._calc_cache[key] = calc
+            else:
+                self.log_debug("Calculated parameters unchanged (cached)")
+            self.calculated_params.update(calc)
             
             # UI Update
-            self.patches_label.configure(text=f"Number of Patches: {num_patches}")
-            self.rows_cols_label.configure(text=f"Configuration: {rows} x {cols}")
-            self.spacing_label.configure(text=f"Spacing: {spacing_mm:.2f} mm")
-            self.dimensions_label.configure(text=f"Patch Dimensions: {L_mm:.2f} x {W_mm:.2f} mm")
-            self.lambda_label.configure(text=f"Guided Wavelength: {lambda_g_mm:.2f} mm")
-            self.feed_offset_label.configure(text=f"Feed Offset (y): {self.calculated_params['feed_offset']:.2f} mm")
-            self.substrate_dims_label.configure(text=f"Substrate Dimensions: {self.calculated_params['substrate_width']:.2f} x {self.calculated_params['substrate_length']:.2f} mm")
+            for name, fmt in _CALC_LABELS:
+                getattr(self, name).configure(text=fmt(calc))
             
             self.status_label.configure(text="Parameters calculated successfully")
             self.log_message("Parameters calculated successfully")
             self.update_quick_status("Ready", "success")
         except Exception as e:
             self.status_label.configure(text=f"Error in calculation: {e}")
-            self.log_message(f"Error in calculation: {e}\nTraceback: {traceback.format_exc()}")
+            self.log_message(f"Error in calculation: {e}\nTraceback: {self._exc_detail(e)}")
             self.update_quick_status("Error", "error")
 
     # --------- AEDT helpers ---------
     def _ensure_material(self, name: str, er: float, tan_d: float):
         """Garante a existência de um material com εr e tanδ informados."""
+        if name in self._known_materials:
+            return
         try:
             # Acessa a biblioteca de materiais através do objeto hfss
             if not self.hfss.materials.checkifmaterialexists(name):
                 new_mat = self.hfss.materials.add_material(name, dielectric_permittivity=er, dielectric_loss_tangent=tan_d)
                 self.log_message(f"Created material: {new_mat.name} (er={er}, tanδ={tan_d})")
+            self._known_materials.add(name)
         except Exception as e:
             self.log_message(f"Material management warning for '{name}': {e}")
 
     def _open_or_create_project(self):
         """Abre o Desktop, cria um projeto temporário e inicializa a classe Hfss."""
         self.log_message(f"Launching AEDT v{self.params['aedt_version']}...")
+        _lazy_aedt()
         # A classe Hfss gerencia a inicialização do Desktop implicitamente
         self.hfss = Hfss(
             specified_version=self.params["aedt_version"],
@@ -738,43 +853,58 @@ class ModernPatchAntennaDesigner:
             close_on_exit=True # Garante que o AEDT fechará com o script
         )
         self.hfss.solution_type = "DrivenModal"
+        self._known_materials.clear()  # nova sessão, biblioteca de materiais nova
         self.log_message("AEDT session initialized successfully.")
         self.log_message(f"Project '{self.hfss.project_name}' created in design '{self.hfss.design_name}'.")
 
-    def _create_coax_feed_lumped(self, ground, substrate, x_feed: float, y_feed: float, name_prefix: str):
-        """Constrói um feed coaxial com uma porta lumped na base."""
+    def _create_coax_feed_lumped(self, ground, substrate, x_feed: float, y_feed: float, name_prefix: str,
+                                 cutouts: Optional[Tuple[list, list]] = None):
+        """Constrói um feed coaxial com uma porta lumped na base.
+
+        Com `cutouts=(furos, antipads)` os recortes são apenas acumulados, para o chamador
+        subtraí-los do substrato/terra numa única operação booleana.
+        """
         try:
             a = self.params["probe_radius"]
             b = a * self.params["coax_ba_ratio"]
             lp = self.params["coax_port_length"]
             h_sub = self.params["substrate_thickness"]
             clearance = self.params["antipad_clearance"]
+            # métodos do modeler resolvidos uma vez (chamado uma vez por patch)
+            modeler = self.hfss.modeler
+            create_cylinder, create_circle = modeler.create_cylinder, modeler.create_circle
             
             # 1. Pino condutor
-            pin = self.hfss.modeler.create_cylinder(
+            pin = create_cylinder(
                 cs_axis="Z", position=[x_feed, y_feed, 0], radius=a, height=h_sub,
                 name=f"{name_prefix}_Pin", matname="copper"
             )
             
             # 2. Vazio no substrato para o dielétrico do coaxial
-            coax_dielectric_hole = self.hfss.modeler.create_cylinder(
+            coax_dielectric_hole = create_cylinder(
                 cs_axis="Z", position=[x_feed, y_feed, 0], radius=b, height=h_sub,
                 name=f"{name_prefix}_VaccumHole"
             )
-            substrate.subtract(coax_dielectric_hole, keep_originals=False)
+            if cutouts is None:
+                substrate.subtract(coax_dielectric_hole, keep_originals=False)
+            else:
+                cutouts[0].append(coax_dielectric_hole)
             
             # 3. Anti-pad no plano de terra
-            antipad = self.hfss.modeler.create_circle(
+            antipad = create_circle(
                 cs_plane="XY", position=[x_feed, y_feed, 0], radius=b + clearance,
                 name=f"{name_prefix}_Antipad"
             )
-            ground.subtract(antipad, keep_originals=False)
+            if cutouts is None:
+                ground.subtract(antipad, keep_originals=False)
+            else:
+                cutouts[1].append(antipad)
 
             # 4. Criação da porta Lumped na base
-            port_sheet = self.hfss.modeler.create_circle(
+            port_sheet = create_circle(
                 cs_plane="XY", position=[x_feed, y_feed, 0], radius=b, name=f"port_sheet_{name_prefix}"
             )
-            pin_cap = self.hfss.modeler.create_circle(
+            pin_cap = create_circle(
                 cs_plane="XY", position=[x_feed, y_feed, 0], radius=a, name=f"pin_cap_{name_prefix}"
             )
             port_sheet.subtract(pin_cap, keep_originals=False)
@@ -786,11 +916,11 @@ class ModernPatchAntennaDesigner:
                 renormalize=True
             )
             self.created_ports.append(f"{name_prefix}_LumpedPort")
-            self.log_message(f"Lumped Port '{name_prefix}_LumpedPort' created.")
+            self.log_debug("Lumped Port '%s_LumpedPort' created.", name_prefix)
             
             return pin
         except Exception as e:
-            self.log_message(f"Exception in coax creation '{name_prefix}': {e}\nTraceback: {traceback.format_exc()}")
+            self.log_message(f"Exception in coax creation '{name_prefix}': {e}\nTraceback: {self._exc_detail(e)}")
             return None
 
     # ------------- Lógica Principal de Simulação -------------
@@ -802,7 +932,7 @@ class ModernPatchAntennaDesigner:
 
         self.simulation_running = True
         self.run_button.configure(state="disabled", text="■ Running...")
-        self.sim_status_label.configure(text="Simulation starting...")
+        self._sim_status_var.set("Simulation starting...")
         self.update_quick_status("Running...", "running")
         self.log_message("Starting simulation thread...")
 
@@ -814,26 +944,33 @@ class ModernPatchAntennaDesigner:
         """Task de simulação executada em uma thread separada, com todas as chamadas corrigidas."""
         try:
             self.log_message("Validating and calculating parameters...")
-            self.window.after(0, lambda: self.sim_status_label.configure(text="Calculating parameters..."))
+            self._sim_status_var.set("Calculating parameters...")
             self.calculate_parameters()
 
-            self.window.after(0, lambda: self.sim_status_label.configure(text="Initializing AEDT..."))
+            self._sim_status_var.set("Initializing AEDT...")
             self._open_or_create_project()
 
             self.log_message("Creating geometry and boundaries...")
-            self.window.after(0, lambda: self.sim_status_label.configure(text="Creating geometry..."))
-            self._create_geometry_and_boundaries()
+            self._sim_status_var.set("Creating geometry...")
+            # sem auto-save do AEDT durante as dezenas de operações de modelagem
+            odesktop = self.hfss.odesktop
+            autosave = odesktop.GetAutoSaveEnabled()
+            odesktop.EnableAutoSave(False)
+            try:
+                self._create_geometry_and_boundaries()
+            finally:
+                odesktop.EnableAutoSave(bool(autosave))
 
             self.log_message("Creating analysis setup...")
-            self.window.after(0, lambda: self.sim_status_label.configure(text="Creating analysis setup..."))
+            self._sim_status_var.set("Creating analysis setup...")
             self._create_analysis_setup()
 
             self.log_message("Starting analysis...")
-            self.window.after(0, lambda: self.sim_status_label.configure(text="Solving... (This may take a while)"))
+            self._sim_status_var.set("Solving... (This may take a while)")
             self.hfss.analyze(setup_name="Setup1") # Executa o setup específico
 
             self.log_message("Performing post-solve setup for beamforming...")
-            self.window.after(0, lambda: self.sim_status_label.configure(text="Post-processing..."))
+            self._sim_status_var.set("Post-processing...")
             self._postprocess_after_solve()
 
             self.window.after(0, self._on_simulation_complete, True, None)
@@ -841,7 +978,7 @@ class ModernPatchAntennaDesigner:
         except Exception as e:
             error_msg = f"An error occurred: {str(e)}"
             self.log_message(error_msg)
-            self.log_message(f"Traceback: {traceback.format_exc()}")
+            self.log_message(f"Traceback: {self._exc_detail(e)}")
             self.window.after(0, self._on_simulation_complete, False, str(e))
 
     def _create_geometry_and_boundaries(self):
@@ -849,14 +986,16 @@ class ModernPatchAntennaDesigner:
         self.created_ports.clear()
         params = self.params
         calc = self.calculated_params
+        modeler = self.hfss.modeler
+        create_rectangle = modeler.create_rectangle
 
         self._ensure_material(params["substrate_material"], params["er"], params["tan_d"])
 
-        gnd = self.hfss.modeler.create_rectangle("XY", [-calc["substrate_width"]/2, -calc["substrate_length"]/2, 0],
+        gnd = create_rectangle("XY", [-calc["substrate_width"]/2, -calc["substrate_length"]/2, 0],
                                                  [calc["substrate_width"], calc["substrate_length"]], name="Ground")
         self.hfss.assign_perfect_e(gnd)
 
-        substrate = self.hfss.modeler.create_box(
+        substrate = modeler.create_box(
             position=[-calc["substrate_width"]/2, -calc["substrate_length"]/2, 0],
             sizes=[calc["substrate_width"], calc["substrate_length"], params["substrate_thickness"]],
             name="Substrate", matname=params["substrate_material"]
@@ -867,26 +1006,38 @@ class ModernPatchAntennaDesigner:
         total_l = calc["rows"] * calc["patch_length"] + (calc["rows"] - 1) * calc["spacing"]
         start_x, start_y = -total_w / 2, -total_l / 2
 
-        all_patches = []
-        for r in range(calc["rows"]):
-            for c in range(calc["cols"]):
-                patch_x = start_x + c * (calc["patch_width"] + calc["spacing"])
-                patch_y = start_y + r * (calc["patch_length"] + calc["spacing"])
+        # Cantos dos patches e pontos de alimentação de toda a grade (ordem linha a linha)
+        rows, cols = calc["rows"], calc["cols"]
+        PX, PY = np.meshgrid(start_x + np.arange(cols) * (calc["patch_width"] + calc["spacing"]),
+                             start_y + np.arange(rows) * (calc["patch_length"] + calc["spacing"]))
+        FX = PX + calc["patch_width"] * params["feed_rel_x"]
+        FY = PY + (calc["patch_length"] / 2 - calc["feed_offset"])
+
+        # lista pré-dimensionada, preenchida por índice (k = r*cols + c)
+        all_patches = [None] * (rows * cols)
+        cutouts = ([], [])
+        for k, (patch_x, patch_y, feed_x_pos, feed_y_pos) in enumerate(
+                zip(PX.ravel().tolist(), PY.ravel().tolist(), FX.ravel().tolist(), FY.ravel().tolist())):
+            r, c = divmod(k, cols)
+            patch = create_rectangle(
+                cs_plane="XY", position=[patch_x, patch_y, params["substrate_thickness"]],
+                dimension_list=[calc["patch_width"], calc["patch_length"]],
+                name=f"Patch_{r}_{c}"
+            )
+            all_patches[k] = patch
 
-                patch = self.hfss.modeler.create_rectangle(
-                    cs_plane="XY", position=[patch_x, patch_y, params["substrate_thickness"]],
-                    dimension_list=[calc["patch_width"], calc["patch_length"]],
-                    name=f"Patch_{r}_{c}"
-                )
-                all_patches.append(patch)
+            self._create_coax_feed_lumped(gnd, substrate, feed_x_pos, feed_y_pos,
+                                          name_prefix=f"P{len(self.created_ports)+1}", cutouts=cutouts)
 
-                feed_x_pos = patch_x + calc["patch_width"] * params["feed_rel_x"]
-                feed_y_pos = patch_y + calc["patch_length"] / 2 - calc["feed_offset"]
-                
-                self._create_coax_feed_lumped(gnd, substrate, feed_x_pos, feed_y_pos, name_prefix=f"P{len(self.created_ports)+1}")
+        # um único subtract por alvo em vez de dois por feed
+        holes, antipads = cutouts
+        if holes:
+            substrate.subtract(holes, keep_originals=False)
+        if antipads:
+            gnd.subtract(antipads, keep_originals=False)
 
         if len(all_patches) > 1:
-            radiator = self.hfss.modeler.unite(all_patches)
+            radiator = modeler.unite(all_patches)
             radiator.name = "Radiator"
         else:
             radiator = all_patches[0]
@@ -926,17 +1077,30 @@ class ModernPatchAntennaDesigner:
 
     def on_closing(self):
         """Lida com o fechamento da janela, liberando recursos do AEDT."""
+        if self._closing:
+            return
         if messagebox.askokcancel("Quit", "Do you want to quit? This will close the AEDT session."):
+            self._closing = True
             self.log_message("Closing application and releasing AEDT resources...")
             if self.hfss:
-                try: 
-                    self.hfss.release_desktop(close_projects=True, close_desktop=True)
-                    self.log_message("AEDT Desktop released.")
-                except Exception as e:
-                    self.log_message(f"Error releasing AEDT: {e}")
+                # a janela fecha já; o AEDT é liberado em segundo plano. Thread não-daemon:
+                # o processo só termina depois que o release_desktop concluir.
+                threading.Thread(target=self._release_aedt, args=(self.hfss,)).start()
             self.window.destroy()
 
+    @staticmethod
+    def _release_aedt(hfss):
+        """Fecha projetos e o Desktop do AEDT (executado fora da thread da GUI; a janela já fechou)."""
+        log = logging.getLogger(__name__)
+        try:
+            hfss.release_desktop(close_projects=True, close_desktop=True)
+            log.info("AEDT Desktop released.")
+        except Exception as e:
+            log.error("Error releasing AEDT: %s", e)
+
 
 if __name__ == "__main__":
+    # destino das mensagens emitidas depois que a janela (e o textbox de log) fecha
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     app = ModernPatchAntennaDesigner()
     app.run()
\ No newline at end of file
@@ -11,61 +11,151 @@ Requisitos:
 Autor: você + ChatGPT (2025)
 """
 
-import os, math, json, tempfile, traceback, threading, queue, re
+import os, math, json, copy, shutil, tempfile, traceback, threading, queue, re, time, subprocess, hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Tuple, Optional, Dict
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, List, Tuple, Optional, Dict
 
 import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import customtkinter as ctk
 
 from ansys.aedt.core import Desktop, Hfss
 
+import microstrip_kernels as _mk
+from microstrip_kernels import C0
+
+# Numba é opcional: sem ele as fórmulas escalares rodam em Python puro
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# orjson é opcional: acelera salvar/carregar parâmetros; sem ele usa json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+LOG_MAX_LINES = 2000
+_NAME_RE = re.compile(r"[^A-Za-z0-9_]")
+
+@lru_cache(maxsize=256)
+def _sanitize(base: str) -> str:
+    """Nome aceito pelo AEDT (só [A-Za-z0-9_]); literais ASCII passam direto."""
+    if base.isascii() and base.isidentifier():
+        return base
+    return _NAME_RE.sub("_", base)
+
 # ---------- Aparência ----------
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("dark-blue")
 
 # ---------- EM utils ----------
-C0 = 299_792_458.0
-
+# Preferência: módulo AOT (python build_emkernels.py) > @njit > Python puro
+try:
+    import emkernels as _aot
+    AOT_KERNELS = True
+except ImportError:
+    AOT_KERNELS = False
+
+if AOT_KERNELS:
+    _hammerstad_w = _aot.hammerstad_w
+    _eff_eps = _aot.eff_eps
+    _patch_dims_er = _aot.patch_dims_er
+elif NUMBA_AVAILABLE:
+    _hammerstad_w = njit(cache=True, fastmath=True)(_mk.hammerstad_w)
+    _eff_eps = njit(cache=True, fastmath=True)(_mk.eff_eps)
+    _patch_dims_er = njit(cache=True, fastmath=True)(_mk.patch_dims_er)
+else:
+    _hammerstad_w = _mk.hammerstad_w
+    _eff_eps = _mk.eff_eps
+    _patch_dims_er = _mk.patch_dims_er
+
+def warmup_kernels():
+    """Força a compilação (ou leitura do cache) dos núcleos Numba."""
+    _hammerstad_w(2.2, 0.5, 50.0)
+    _eff_eps(2.2, 0.5, 1.5)
+    _patch_dims_er(10.0, 2.2, 0.5)
+
+@lru_cache(maxsize=128)
 def hammerstad_w(er: float, h_mm: float, z0: float) -> float:
     """Largura (mm) de microstrip para Z0, εr, h(mm)."""
-    h = float(h_mm)
-    A = z0 / 60.0 * math.sqrt((er + 1) / 2) + (er - 1) / (er + 1) * (0.23 + 0.11 / er)
-    w_h = (8 * math.exp(A)) / (math.exp(2 * A) - 2)
-    if w_h < 2:
-        W = w_h * h
-    else:
-        B = (377 * math.pi) / (2 * z0 * math.sqrt(er))
-        W = h * (2 / math.pi) * (B - 1 - math.log(2 * B - 1)
-             + (er - 1) / (2 * er) * (math.log(B - 1) + 0.39 - 0.61 / er))
-    return max(W, 0.05)
+    return _hammerstad_w(float(er), float(h_mm), float(z0))
+
+# Impedâncias da rede corporativa e as variáveis de largura correspondentes
+Z0_LEVELS = (50.0, 70.710678, 100.0, 141.421356, 200.0)
+Z0_WVARS = ("W50", "W70", "W100", "W141", "W200")
 
+class Z(IntEnum):
+    """Índice de cada nível de Z0 nas tabelas _widths/_qwls."""
+    Z50 = 0; Z70 = 1; Z100 = 2; Z141 = 3; Z200 = 4
+
+def hammerstad_w_vec(er: float, h_mm: float, z0) -> np.ndarray:
+    """hammerstad_w para um vetor de Z0 de uma vez (mm)."""
+    z0 = np.asarray(z0, dtype=float)
+    h = float(h_mm)
+    A = z0 / 60.0 * np.sqrt((er + 1) / 2) + (er - 1) / (er + 1) * (0.23 + 0.11 / er)
+    w_h = (8 * np.exp(A)) / (np.exp(2 * A) - 2)
+    B = (377 * np.pi) / (2 * z0 * np.sqrt(er))
+    # o ramo largo não é definido para linhas estreitas (B pequeno); np.where descarta esses valores
+    with np.errstate(invalid="ignore", divide="ignore"):
+        W_wide = h * (2 / np.pi) * (B - 1 - np.log(2 * B - 1)
+                 + (er - 1) / (2 * er) * (np.log(B - 1) + 0.39 - 0.61 / er))
+    return np.maximum(np.where(w_h < 2, w_h * h, W_wide), 0.05)
+
+@lru_cache(maxsize=128)
 def eff_eps(er: float, h_mm: float, w_mm: float) -> float:
     """εef Hammerstad."""
-    h = float(h_mm)
-    w = max(w_mm, 1e-3)
-    u = w / h
-    a = 1 + (1 / 49.0) * math.log((u**4 + (u/52.0)**2)/(u**4 + 0.432)) + (1/18.7) * math.log(1 + (u/18.1)**3)
-    b = 0.564 * ((er - 0.9)/(er + 3))**0.053
-    return (er + 1) / 2 + (er - 1) / 2 * (1 + 10 / u)**(-a * b)
+    return _eff_eps(float(er), float(h_mm), float(w_mm))
 
+@lru_cache(maxsize=128)
 def guided_lambda_mm(freq_ghz: float, er: float, h_mm: float, w_mm: float) -> float:
     ee = eff_eps(er, h_mm, w_mm)
     return C0 / (freq_ghz * 1e9 * math.sqrt(ee)) * 1000.0
 
+@lru_cache(maxsize=128)
 def patch_dims_er(f_ghz: float, er: float, h_mm: float) -> Tuple[float, float, float]:
     """Dimensões de patch (L, W) e λg aproximado (mm)."""
-    f = f_ghz * 1e9
-    h = h_mm / 1000.0
-    W = C0 / (2 * f) * math.sqrt(2 / (er + 1))
-    eeff = (er + 1) / 2 + (er - 1) / 2 * (1 + 12 * h / W)**-0.5
-    dL = 0.412 * h * ((eeff + 0.3) * (W / h + 0.264)) / ((eeff - 0.258) * (W / h + 0.8))
-    L_eff = C0 / (2 * f * math.sqrt(eeff))
-    L = L_eff - 2 * dL
-    lamg = C0 / (f * math.sqrt(eeff))
-    return L * 1000.0, W * 1000.0, lamg * 1000.0
+    return _patch_dims_er(float(f_ghz), float(er), float(h_mm))
+
+def aaa_fit(z, f, tol: float = 1e-9, mmax: int = 40):
+    """
+    AAA (Loewner + SVD): aproximação racional baricêntrica de f(z).
+    Retorna (zj, fj, wj) = nós, valores e pesos do interpolante.
+    """
+    z = np.asarray(z, dtype=float); f = np.asarray(f, dtype=complex)
+    mask = np.ones(z.size, dtype=bool)
+    R = np.full(f.size, f.mean())
+    zj, fj = [], []
+    wj = np.ones(1, dtype=complex)
+    for _ in range(min(mmax, z.size - 1)):
+        j = int(np.argmax(np.abs(f - R) * mask))
+        zj.append(z[j]); fj.append(f[j]); mask[j] = False
+        C = 1.0 / (z[mask, None] - np.asarray(zj)[None, :])
+        A = (f[mask, None] - np.asarray(fj)[None, :]) * C      # matriz de Loewner
+        wj = np.linalg.svd(A, full_matrices=True)[2][-1].conj()
+        R = f.copy()
+        R[mask] = (C @ (wj * np.asarray(fj))) / (C @ wj)
+        if np.max(np.abs(f - R)) <= tol * np.max(np.abs(f)): break
+    return np.asarray(zj), np.asarray(fj), wj
+
+def aaa_eval(zj, fj, wj, x) -> np.ndarray:
+    """Avalia o interpolante AAA em x (nos nós devolve o valor amostrado)."""
+    x = np.asarray(x, dtype=float)
+    d = x[:, None] - zj[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        C = 1.0 / d
+        r = (C @ (wj * fj)) / (C @ wj)
+    i, j = np.nonzero(d == 0)
+    r[i] = fj[j]
+    return r
 
 def suggest_rows_cols_from_gain(g_des_dbi: float, max_side: int = 10) -> Tuple[int, int, int]:
     """Sugere N≈10^((Gdes-8)/10) e fatora em m×n."""
@@ -74,11 +164,10 @@ def suggest_rows_cols_from_gain(g_des_dbi: float, max_side: int = 10) -> Tuple[i
     n_req = min(n_req, max_side * max_side)
     root = int(round(math.sqrt(n_req)))
     r = max(1, min(max_side, root))
-    c = max(1, min(max_side, int(math.ceil(n_req / r))))
-    while r * c < n_req and (r < max_side or c < max_side):
-        if r <= c and r < max_side: r += 1
-        elif c < max_side: c += 1
-        else: break
+    c = max(1, min(max_side, -(-n_req // r)))
+    # só falta área quando c saturou em max_side: ajusta r uma única vez
+    if r * c < n_req:
+        r = min(max_side, -(-n_req // c))
     return r, c, r * c
 
 # ---------- App ----------
@@ -94,6 +183,10 @@ class PatchArrayApp:
         self.cols = 2
         self.n_total = 4
         self._id = 0
+        self._id_lock = threading.Lock()
+        self._pending_vars: Dict[str, str] = {}
+        # nomes (minúsculos, como em material_keys) já presentes no projeto
+        self._known_materials: set = set()
         self._portname = "P0_Lumped"
 
         # Parâmetros do usuário (GUI)
@@ -102,8 +195,11 @@ class PatchArrayApp:
             "gain": 12.0,
             "sweep_start": 8.0,
             "sweep_stop": 12.0,
-            "sweep_type": "Interpolating",
+            "sweep_type": "Fast",  # iteração rápida; "Solução final" usa Interpolating
             "sweep_step": 0.02,
+            "parallel_build": False,  # cria a rede corporativa com vários workers
+            "force_new_aedt": False,  # ignora sessões AEDT já abertas
+            "farfield": True,  # extrai os cortes de ganho após a simulação
 
             "substrate_material": "Duroid (tm)",  # se não existir, cria Custom_Substrate
             "er": 2.2,
@@ -127,13 +223,23 @@ class PatchArrayApp:
 
         # Calculados / variáveis do design
         self.calc: Dict[str, float] = {}
+        # tabelas por nível de Z0 (índice Z): larguras e λg/4 em mm
+        self._widths = np.zeros(len(Z0_LEVELS))
+        self._qwls = np.zeros(len(Z0_LEVELS))
 
         # GUI infra
         self.log_q = queue.Queue()
         self.sim_running = False
         self.sim_data = None
+        self._final_solve = False  # execução de verificação (Interpolating)
+        self._sweep_kind = None    # sweep efetivamente criado em _build_design
+        self._adaptive_s11 = None  # (f GHz, dB) do modelo racional do sweep Adaptive
+        self._mesh_cache: Dict[str, str] = {}  # hash da geometria -> projeto já resolvido
 
         self._build_gui()
+        if NUMBA_AVAILABLE and not AOT_KERNELS:
+            # compila os núcleos fora da thread da GUI antes do primeiro "Calcular"
+            threading.Thread(target=warmup_kernels, daemon=True).start()
 
     # ---------- GUI ----------
     def _build_gui(self):
@@ -229,7 +335,9 @@ class PatchArrayApp:
         ctk.CTkButton(bt, text="Aplicar", command=self._apply_mn, fg_color="#22c55e").pack(side="left", padx=6)
 
         self.lb_dims = ctk.CTkLabel(secL, text="Patch: -- × -- mm | λg(50 Ω): -- mm | Substrato: -- × -- mm")
-        self.lb_dims.grid(row=rr, column=0, padx=12, pady=(8,6), sticky="w")
+        self.lb_dims.grid(row=rr, column=0, padx=12, pady=(8,6), sticky="w"); rr+=1
+        self.lb_gain = ctk.CTkLabel(secL, text="Ganho estimado (fator de array): -- dBi")
+        self.lb_gain.grid(row=rr, column=0, padx=12, pady=(0,6), sticky="w")
 
         # Substrato
         secS = self._section(main, "Substrato e Metal", 2)
@@ -255,12 +363,23 @@ class PatchArrayApp:
         secP = self._section(main, "Simulação", 4); rp=2
         self._entry(secP, "Cores CPU", "cores", rp); rp+=1
         ctk.CTkLabel(secP, text="Sweep").grid(row=rp, column=0, padx=12, pady=6, sticky="w")
-        self.cb_sweep = ctk.CTkComboBox(secP, values=["Interpolating", "Discrete", "Fast"], width=160)
+        self.cb_sweep = ctk.CTkComboBox(secP, values=["Interpolating", "Discrete", "Fast", "Adaptive"], width=160)
         self.cb_sweep.set(self.p["sweep_type"]); self.cb_sweep.grid(row=rp, column=1, padx=12, pady=6, sticky="w"); rp+=1
         self._entry(secP, "Passo Discrete (GHz)", "sweep_step", rp); rp+=1
 
         self.ch_save = ctk.CTkCheckBox(secP, text="Salvar projeto AEDT", onvalue=True, offvalue=False)
-        self.ch_save.grid(row=rp, column=0, padx=12, pady=6, sticky="w")
+        self.ch_save.grid(row=rp, column=0, padx=12, pady=6, sticky="w"); rp+=1
+        self.ch_par = ctk.CTkCheckBox(secP, text="Construir rede em paralelo (experimental)", onvalue=True, offvalue=False)
+        self.ch_par.grid(row=rp, column=0, padx=12, pady=6, sticky="w")
+        if self.p["parallel_build"]: self.ch_par.select()
+        rp+=1
+        self.ch_newaedt = ctk.CTkCheckBox(secP, text="Forçar nova sessão AEDT", onvalue=True, offvalue=False)
+        self.ch_newaedt.grid(row=rp, column=0, padx=12, pady=6, sticky="w")
+        if self.p["force_new_aedt"]: self.ch_newaedt.select()
+        rp+=1
+        self.ch_ff = ctk.CTkCheckBox(secP, text="Extrair far-field", onvalue=True, offvalue=False)
+        self.ch_ff.grid(row=rp, column=0, padx=12, pady=6, sticky="w")
+        if self.p["farfield"]: self.ch_ff.select()
 
         # Ações
         act = ctk.CTkFrame(main); act.grid(row=5, column=0, sticky="w", padx=8, pady=10)
@@ -275,6 +394,10 @@ class PatchArrayApp:
         self.bt_run.pack(side="left", padx=6)
         self.bt_stop = ctk.CTkButton(top, text="Parar", command=self._stop, state="disabled", fg_color="#dc2626", width=160, height=40)
         self.bt_stop.pack(side="left", padx=6)
+        self.bt_final = ctk.CTkButton(top, text="Solução final", command=self._start_final, fg_color="#7c3aed", width=160, height=40)
+        self.bt_final.pack(side="left", padx=6)
+        self.bt_batch = ctk.CTkButton(top, text="Lote (espaçamentos)", command=self._start_batch, width=160, height=40)
+        self.bt_batch.pack(side="left", padx=6)
 
         pr = ctk.CTkFrame(tab); pr.grid(row=1, column=0, sticky="ew", padx=10, pady=6)
         ctk.CTkLabel(pr, text="Progresso:").pack(anchor="w")
@@ -287,18 +410,11 @@ class PatchArrayApp:
         ct = ctk.CTkFrame(tab); ct.grid(row=0, column=0, sticky="ew", padx=10, pady=(10,0))
         ctk.CTkLabel(ct, text="Resultados", font=ctk.CTkFont(size=18, weight="bold")).pack(anchor="w")
 
-        plot = ctk.CTkFrame(tab); plot.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
-        plot.grid_columnconfigure(0, weight=1); plot.grid_rowconfigure(0, weight=1)
-
-        self.fig = plt.figure(figsize=(10, 8))
-        face = '#1e1e1e' if ctk.get_appearance_mode()=="Dark" else "#ffffff"
-        self.fig.patch.set_facecolor(face)
-        self.ax_s11 = self.fig.add_subplot(2,1,1); self.ax_s11.set_facecolor(face)
-        self.ax_ff  = self.fig.add_subplot(2,1,2); self.ax_ff.set_facecolor(face)
-        for ax in [self.ax_s11, self.ax_ff]: ax.grid(True, alpha=0.35)
-
-        self.canvas = FigureCanvasTkAgg(self.fig, master=plot)
-        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        # figura criada sob demanda em _ensure_figure (só quando há resultados)
+        self.plot_frame = ctk.CTkFrame(tab); self.plot_frame.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+        self.plot_frame.grid_columnconfigure(0, weight=1); self.plot_frame.grid_rowconfigure(0, weight=1)
+        self.fig = None
+        self._results_ready = False
 
     def _tab_log(self):
         tab = self.tabs.tab("Log")
@@ -311,12 +427,17 @@ class PatchArrayApp:
     # ---------- Log helpers ----------
     def _log(self, msg): self.log_q.put(f"[{datetime.now():%H:%M:%S}] {msg}")
     def _log_pump(self):
+        # drena tudo e insere num único bloco (um redraw por tick)
+        msgs = []
         try:
             while True:
-                m = self.log_q.get_nowait()
-                self.log_box.insert("end", m+"\n"); self.log_box.see("end")
+                msgs.append(self.log_q.get_nowait())
         except queue.Empty:
             pass
+        if msgs:
+            self.log_box.insert("end", "\n".join(msgs) + "\n")
+            self.log_box.delete("1.0", f"end-{LOG_MAX_LINES}l")  # mantém só as últimas linhas
+            self.log_box.see("end")
         self.win.after(120, self._log_pump)
 
     # ---------- GUI actions ----------
@@ -342,6 +463,9 @@ class PatchArrayApp:
             self.p["substrate_material"] = self.cb_mat.get()
             self.p["sweep_type"]  = self.cb_sweep.get()
             self.p["spacing_scale"]= float(self.cb_spacing.get())
+            self.p["parallel_build"] = bool(self.ch_par.get())
+            self.p["force_new_aedt"] = bool(self.ch_newaedt.get())
+            self.p["farfield"] = bool(self.ch_ff.get())
             return True
         except Exception as e:
             self.lb_status.configure(text=f"Erro: {e}")
@@ -363,6 +487,18 @@ class PatchArrayApp:
 
     def _calculate(self):
         if not self._get_params(): return
+        self._compute_calc()
+        c = self.calc
+        self.lb_dims.configure(text=(f"Patch: {c['patchL']:.2f}×{c['patchW']:.2f} mm | λg(50Ω): {c['lamg50']:.2f} mm | "
+                                     f"Substrato: {c['subW']:.1f}×{c['subL']:.1f} mm"))
+        g = self._estimate_gain()
+        self.lb_gain.configure(text=f"Ganho estimado (fator de array): {g:.1f} dBi "
+                                    f"({'atinge' if g >= self.p['gain'] else 'abaixo de'} {self.p['gain']:.1f} dBi)")
+        self.lb_status.configure(text="Parâmetros calculados.")
+        self._log("Parâmetros e variáveis calculados.")
+
+    def _compute_calc(self):
+        """Preenche self.calc (e _widths/_qwls) a partir de self.p, sem tocar na GUI."""
         # Dimensões patch e espaçamento
         L_mm, W_mm, lamg50 = patch_dims_er(self.p["frequency"], self.p["er"], self.p["h_sub"])
         self.calc["patchL"] = L_mm; self.calc["patchW"] = W_mm; self.calc["lamg50"] = lamg50
@@ -379,33 +515,68 @@ class PatchArrayApp:
 
         # Larguras de linha
         h = self.p["h_sub"]; er = self.p["er"]
-        self.calc["W50"]  = hammerstad_w(er, h, 50.0)
-        self.calc["W70"]  = hammerstad_w(er, h, 70.710678)
-        self.calc["W100"] = hammerstad_w(er, h, 100.0)
-        self.calc["W141"] = hammerstad_w(er, h, 141.421356)
-        self.calc["W200"] = hammerstad_w(er, h, 200.0)
-
-        # λ/4 de 70,7 e 141 (para variável global)
-        self.calc["Lq70"]  = guided_lambda_mm(self.p["frequency"], er, h, self.calc["W70"]) / 4.0
-        self.calc["Lq141"] = guided_lambda_mm(self.p["frequency"], er, h, self.calc["W141"]) / 4.0
-
-        self.lb_dims.configure(text=(f"Patch: {L_mm:.2f}×{W_mm:.2f} mm | λg(50Ω): {lamg50:.2f} mm | "
-                                     f"Substrato: {self.calc['subW']:.1f}×{self.calc['subL']:.1f} mm"))
-        self.lb_status.configure(text="Parâmetros calculados.")
-        self._log("Parâmetros e variáveis calculados.")
+        self._widths[:] = hammerstad_w_vec(er, h, Z0_LEVELS)
+        self.calc.update(zip(Z0_WVARS, self._widths.tolist()))
+        self._fill_qwls()
+
+    def _patch_axes(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Coordenadas (mm) das colunas (xs) e das linhas (ys) do array."""
+        Wp = self.calc["patchW"]; Lp = self.calc["patchL"]
+        sx = self.calc["spacingX"]; sy = self.calc["spacingY"]
+        xs = -((self.cols-1)/2.0 - np.arange(self.cols))*(Wp + sx)
+        ys = ((self.rows-1)/2.0 - np.arange(self.rows))*(Lp + sy)
+        return xs, ys
+
+    def _patch_centers(self) -> np.ndarray:
+        """Centros (N,2) dos patches em mm, coluna a coluna."""
+        X, Y = np.meshgrid(*self._patch_axes(), indexing="ij")
+        return np.column_stack((X.ravel(), Y.ravel()))
+
+    def _estimate_gain(self, g_elem: float = 8.0) -> float:
+        """
+        Ganho aproximado (dBi) sem AEDT: elemento de g_elem dBi + diretividade
+        do fator de array |AF|² (máximo / média na esfera) sobre os centros.
+        """
+        k = 2*math.pi * self.p["frequency"]*1e9 / C0 / 1000.0   # rad/mm
+        th = np.linspace(0.0, math.pi, 91, dtype=np.float32)
+        ph = np.linspace(0.0, 2*math.pi, 180, endpoint=False, dtype=np.float32)
+        T, P = np.meshgrid(th, ph, indexing="ij")
+        uv = np.stack([np.sin(T)*np.cos(P), np.sin(T)*np.sin(P)], axis=-1)      # (θ,φ,2)
+        c = self._patch_centers().astype(np.float32)
+        af = np.abs(np.exp(1j*k*np.einsum("tpk,nk->tpn", uv, c)).sum(axis=-1))**2
+        w = np.sin(T)                                                             # dΩ ∝ sinθ
+        d_af = af.max() * w.sum() / (af * w).sum()
+        return g_elem + 10*math.log10(d_af)
+
+    def _fill_qwls(self):
+        """λg/4 de cada nível a partir de _widths; 70,7 e 141 viram variáveis globais."""
+        f = self.p["frequency"]; er = self.p["er"]; h = self.p["h_sub"]
+        self._qwls[:] = [guided_lambda_mm(f, er, h, w) / 4.0 for w in self._widths.tolist()]
+        self.calc["Lq70"] = float(self._qwls[Z.Z70])
+        self.calc["Lq141"] = float(self._qwls[Z.Z141])
 
     def _save_params(self):
         d = {"user": self.p, "calc": self.calc, "rows": self.rows, "cols": self.cols}
-        with open("antenna_parameters.json", "w") as f: json.dump(d, f, indent=2)
+        if ORJSON_AVAILABLE:
+            with open("antenna_parameters.json", "wb") as f:
+                f.write(orjson.dumps(d, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open("antenna_parameters.json", "w") as f: json.dump(d, f, indent=2)
         self._log("Parâmetros salvos.")
 
     def _load_params(self):
         try:
-            with open("antenna_parameters.json") as f: d = json.load(f)
+            if ORJSON_AVAILABLE:
+                with open("antenna_parameters.json", "rb") as f: d = orjson.loads(f.read())
+            else:
+                with open("antenna_parameters.json") as f: d = json.load(f)
             self.p.update(d.get("user", {}))
             self.calc.update(d.get("calc", {}))
             self.rows = d.get("rows", self.rows)
             self.cols = d.get("cols", self.cols)
+            if all(k in self.calc for k in Z0_WVARS):
+                self._widths[:] = [self.calc[k] for k in Z0_WVARS]
+                self._fill_qwls()
             # refletir
             for k,v in self.p.items():
                 e = getattr(self, f"ent_{k}", None)
@@ -416,18 +587,48 @@ class PatchArrayApp:
             self.cb_spacing.set(str(self.p["spacing_scale"]))
             self.sl_rows.set(self.rows); self.lb_rows.configure(text=str(self.rows))
             self.sl_cols.set(self.cols); self.lb_cols.configure(text=str(self.cols))
+            (self.ch_par.select if self.p["parallel_build"] else self.ch_par.deselect)()
+            (self.ch_newaedt.select if self.p["force_new_aedt"] else self.ch_newaedt.deselect)()
+            (self.ch_ff.select if self.p["farfield"] else self.ch_ff.deselect)()
             self._log("Parâmetros carregados.")
         except Exception as e:
             self._log(f"Erro ao carregar: {e}")
 
     # ---------- AEDT helpers ----------
     def _safe_name(self, base: str) -> str:
-        self._id += 1
-        base = re.sub(r"[^A-Za-z0-9_]", "_", base)
-        return f"{base}_{self._id:04d}"
+        base = _sanitize(base)
+        with self._id_lock:
+            self._id += 1
+            n = self._id
+        return f"{base}_{n:04d}"
 
     def _set_var(self, name: str, value_mm: float):
-        self.hfss[name] = f"{float(value_mm):.6f}mm"
+        # acumulada; aplicada de uma vez em _flush_vars
+        self._pending_vars[name] = f"{float(value_mm):.6f}mm"
+
+    def _set_vars_bulk(self, mapping: Dict[str, float]):
+        """Define várias variáveis (mm) numa única transação ChangeProperty."""
+        for k, v in mapping.items():
+            self._set_var(k, v)
+        self._flush_vars()
+
+    def _flush_vars(self):
+        """Cria todas as variáveis pendentes num único ChangeProperty."""
+        if not self._pending_vars: return
+        new_props = [[f"NAME:{k}", "PropType:=", "VariableProp", "UserDef:=", True, "Value:=", v]
+                     for k, v in self._pending_vars.items()]
+        props = ["NAME:AllTabs",
+                 ["NAME:LocalVariableTab",
+                  ["NAME:PropServers", "LocalVariables"],
+                  ["NAME:NewProps", *new_props]]]
+        try:
+            self.hfss.odesign.ChangeProperty(props)
+        except Exception as e:
+            # variável já existente (ou versão sem NewProps): uma a uma
+            self._log(f"ChangeProperty em lote falhou ({e}); definindo variáveis uma a uma.")
+            for k, v in self._pending_vars.items():
+                self.hfss[k] = v
+        self._pending_vars.clear()
 
     def _set_unitless(self, name: str, value: float):
         self.hfss[name] = float(value)
@@ -443,13 +644,53 @@ class PatchArrayApp:
                                                   name=self._safe_name(name), material=mat)
 
     def _rect_h_run(self, x1, x2, y, wvar, name):
-        """Retângulo horizontal (wvar = nome de variável da largura)."""
+        """Retângulo horizontal (wvar = índice Z da largura, ex. Z.Z100)."""
         x_min, x_max = (x1, x2) if x1 <= x2 else (x2, x1)
-        return self._rect_xy(x_min, y - f"({wvar})/2", x_max - x_min, wvar, name)
+        w_mm = float(self._widths[wvar])
+        return self._rect_xy(x_min, y - w_mm/2, x_max - x_min, w_mm, name)
 
     def _rect_v_run(self, y1, y2, x, wvar, name):
+        """Retângulo vertical (wvar = índice Z da largura)."""
         y_min, y_max = (y1, y2) if y1 <= y2 else (y2, y1)
-        return self._rect_xy(x - f"({wvar})/2", y_min, wvar, y_max - y_min, name)
+        w_mm = float(self._widths[wvar])
+        return self._rect_xy(x - w_mm/2, y_min, w_mm, y_max - y_min, name)
+
+    def _create_rects_batch(self, prims):
+        """
+        Cria retângulos XY de cobre em z=h_sub numa única ida ao AEDT: gera um
+        script com todos os CreateRectangle e executa via RunScript.
+        prims: [(nome, x, y, w, h)] com expressões. Se falhar, cria um a um.
+        """
+        if not prims: return
+        lines = [
+            "import ScriptEnv",
+            'ScriptEnv.Initialize("Ansoft.ElectronicsDesktop")',
+            'oEditor = oDesktop.GetActiveProject().GetActiveDesign().SetActiveEditor("3D Modeler")',
+            "def R(n, x, y, w, h):",
+            '    oEditor.CreateRectangle(["NAME:RectangleParameters", "IsCovered:=", True, "XStart:=", x, "YStart:=", y,'
+            ' "ZStart:=", "h_sub", "Width:=", w, "Height:=", h, "WhichAxis:=", "Z"],',
+            '        ["NAME:Attributes", "Name:=", n, "Flags:=", "", "Color:=", "(255 128 65)", "Transparency:=", 0,'
+            ' "PartCoordinateSystem:=", "Global", "UDMId:=", "", "MaterialValue:=", "\\"copper\\"",'
+            ' "SurfaceMaterialValue:=", "\\"\\"", "SolveInside:=", False, "IsMaterialEditable:=", True,'
+            ' "UseMaterialAppearance:=", False, "IsLightweight:=", False])',
+        ]
+        lines += [f"R({n!r}, {str(x)!r}, {str(y)!r}, {str(w)!r}, {str(h)!r})" for n, x, y, w, h in prims]
+        fd, path = tempfile.mkstemp(suffix=".py", prefix="rects_")
+        try:
+            with os.fdopen(fd, "w") as f: f.write("\n".join(lines) + "\n")
+            self.desktop.odesktop.RunScript(path)
+            self.hfss.modeler.refresh_all_ids()
+        except Exception as e:
+            self._log(f"Script em lote falhou ({e}); criando {len(prims)} retângulos um a um.")
+            # o script pode ter parado no meio: sincroniza o cache antes de ver o que já existe
+            self.hfss.modeler.refresh_all_ids()
+            done = set(self.hfss.modeler.object_names)
+            for n, x, y, w, h in prims:
+                if n not in done:
+                    self.hfss.modeler.create_rectangle("XY", [x, y, "h_sub"], [w, h], name=n, material="copper")
+        finally:
+            try: os.remove(path)
+            except OSError: pass
 
     # --- portas/ coaxes ---
     def _coax_lumped(self, x0, y0, ground, substrate):
@@ -500,83 +741,141 @@ class PatchArrayApp:
         return guided_lambda_mm(self.p["frequency"], self.p["er"], self.p["h_sub"],
                                 hammerstad_w(self.p["er"], self.p["h_sub"], z0)) / 4.0
 
-    def _build_x_tree(self, xs: List[float], y: float, parent_x: float) -> List[Tuple[float,float]]:
+    def _build_x_tree(self, xs: List[float], y: float, parent_x: float, jobs: list) -> List[Tuple[float,float]]:
         """
         H-tree horizontal: da junção (parent_x,y) até colunas xs.
+        Os trechos vão para jobs como ("h", x1, x2, y, wvar, nome).
         Retorna pontos de junção por coluna [(x_col, y)].
         """
         xs = sorted(xs)
+        Lq70 = float(self._qwls[Z.Z70])
+        copysign, emit = math.copysign, jobs.append
         leaves: List[Tuple[float,float]] = []
-        if len(xs) == 1:
-            # ligação direta: QW70 + 100Ω até x_col
-            x_col = xs[0]
-            self._rect_h_run(parent_x, parent_x + math.copysign(self.calc["Lq70"], x_col - parent_x),
-                             y, "W70", "X_Q70")
-            self._rect_h_run(parent_x + math.copysign(self.calc["Lq70"], x_col - parent_x), x_col, y, "W100", "X_100")
-            return [(x_col, y)]
-
-        # split em dois grupos
-        mid = len(xs)//2
-        left, right = xs[:mid], xs[mid:]
-        # junções dos filhos no meio de cada grupo
-        xL = 0.5*(left[0] + left[-1])
-        xR = 0.5*(right[0] + right[-1])
-
-        # parent -> filho L
-        dirL = math.copysign(1.0, xL - parent_x)
-        self._rect_h_run(parent_x, parent_x + dirL*self.calc["Lq70"], y, "W70", "X_Q70_L")
-        self._rect_h_run(parent_x + dirL*self.calc["Lq70"], xL, y, "W100", "X_100_L")
-        # parent -> filho R
-        dirR = math.copysign(1.0, xR - parent_x)
-        self._rect_h_run(parent_x, parent_x + dirR*self.calc["Lq70"], y, "W70", "X_Q70_R")
-        self._rect_h_run(parent_x + dirR*self.calc["Lq70"], xR, y, "W100", "X_100_R")
-
-        leaves += self._build_x_tree(left, y, xL)
-        leaves += self._build_x_tree(right, y, xR)
+        # pilha de (início, fim, x da junção); direita empilhada antes para manter a ordem
+        stack = [(0, len(xs), parent_x)]
+        while stack:
+            lo, hi, px = stack.pop()
+            if hi - lo == 1:
+                # ligação direta: QW70 + 100Ω até x_col
+                x_col = xs[lo]
+                xq = px + copysign(Lq70, x_col - px)
+                emit(("h", px, xq, y, Z.Z70, "X_Q70"))
+                emit(("h", xq, x_col, y, Z.Z100, "X_100"))
+                leaves.append((x_col, y))
+                continue
+
+            # split em dois grupos; junções dos filhos no meio de cada grupo
+            mid = lo + (hi - lo)//2
+            xL = 0.5*(xs[lo] + xs[mid-1])
+            xR = 0.5*(xs[mid] + xs[hi-1])
+
+            # parent -> filho L
+            dirL = copysign(1.0, xL - px)
+            emit(("h", px, px + dirL*Lq70, y, Z.Z70, "X_Q70_L"))
+            emit(("h", px + dirL*Lq70, xL, y, Z.Z100, "X_100_L"))
+            # parent -> filho R
+            dirR = copysign(1.0, xR - px)
+            emit(("h", px, px + dirR*Lq70, y, Z.Z70, "X_Q70_R"))
+            emit(("h", px + dirR*Lq70, xR, y, Z.Z100, "X_100_R"))
+
+            stack.append((mid, hi, xR))
+            stack.append((lo, mid, xL))
         return leaves
 
-    def _build_y_tree(self, x: float, ys: List[float], parent_y: float) -> None:
+    def _build_y_tree(self, x: float, ys: List[float], parent_y: float, jobs: list) -> None:
         """
         H-tree vertical: da junção (x,parent_y) até linhas ys (centros dos patches).
         Na folha: λ/4 141Ω e stub 200Ω horizontal até o patch.
+        Os trechos vão para jobs como ("v", y1, y2, x, wvar, nome).
         """
         ys = sorted(ys)
-        if len(ys) == 1:
-            y_p = ys[0]
-            # do parent à proximidade do patch (100Ω) + QW141 vertical
-            dirU = math.copysign(1.0, y_p - parent_y)
-            # 100Ω até aproximar Lq141/2 antes do patch
-            run = max(0.2, abs(y_p - parent_y) - self.calc["Lq141"]/2 - 0.2)
-            y1 = parent_y
-            y2 = parent_y + dirU*run
-            if run > 0:
-                self._rect_v_run(y1, y2, x, "W100", "Y_100")
-            # QW141
-            self._rect_v_run(y2, y2 + dirU*self.calc["Lq141"], x, "W141", "Y_Q141")
-            # stub 200Ω horizontal até a borda do patch (borda interna)
-            # (stub criado junto do patch na geração dos patches, OVL garante contato)
+        Lq70 = float(self._qwls[Z.Z70]); Lq141 = float(self._qwls[Z.Z141])
+        copysign, emit = math.copysign, jobs.append
+        stack = [(0, len(ys), parent_y)]
+        while stack:
+            lo, hi, py = stack.pop()
+            if hi - lo == 1:
+                y_p = ys[lo]
+                # do parent à proximidade do patch (100Ω) + QW141 vertical
+                dirU = copysign(1.0, y_p - py)
+                # 100Ω até aproximar Lq141/2 antes do patch
+                run = max(0.2, abs(y_p - py) - Lq141/2 - 0.2)
+                y2 = py + dirU*run
+                if run > 0:
+                    emit(("v", py, y2, x, Z.Z100, "Y_100"))
+                # QW141
+                emit(("v", y2, y2 + dirU*Lq141, x, Z.Z141, "Y_Q141"))
+                # stub 200Ω horizontal até a borda do patch (borda interna)
+                # (stub criado junto do patch na geração dos patches, OVL garante contato)
+                continue
+
+            # split
+            mid = lo + (hi - lo)//2
+            yL = 0.5*(ys[lo] + ys[mid-1])
+            yH = 0.5*(ys[mid] + ys[hi-1])
+
+            # parent -> filho baixo
+            dirD = copysign(1.0, yL - py)
+            emit(("v", py, py + dirD*Lq70, x, Z.Z70, "Y_Q70_L"))
+            emit(("v", py + dirD*Lq70, yL, x, Z.Z100, "Y_100_L"))
+            # parent -> filho alto
+            dirU = copysign(1.0, yH - py)
+            emit(("v", py, py + dirU*Lq70, x, Z.Z70, "Y_Q70_H"))
+            emit(("v", py + dirU*Lq70, yH, x, Z.Z100, "Y_100_H"))
+
+            stack.append((mid, hi, yH))
+            stack.append((lo, mid, yL))
+
+    def _create_runs(self, jobs: list) -> None:
+        """
+        Cria os trechos coletados pelas H-trees. Com "parallel_build" ativo,
+        despacha para um pool de threads, mas mede uma amostra serial antes e
+        volta para o modo serial se o AEDT não ganhar vazão (RPCs serializados)
+        ou se algum worker falhar (ex.: thread sem COM inicializado).
+        """
+        make = {"h": self._rect_h_run, "v": self._rect_v_run}
+        def run(job): return make[job[0]](*job[1:])
+
+        workers = max(1, int(self.p.get("cores", 4)))
+        if not self.p.get("parallel_build") or workers == 1 or len(jobs) <= 3 * workers:
+            for job in jobs: run(job)
             return
 
-        # split
-        mid = len(ys)//2
-        low, high = ys[:mid], ys[mid:]
-        yL = 0.5*(low[0] + low[-1])
-        yH = 0.5*(high[0] + high[-1])
+        # referência serial
+        t0 = time.perf_counter()
+        for job in jobs[:workers]: run(job)
+        t_ser = (time.perf_counter() - t0) / workers
 
-        # parent -> filho baixo
-        dirD = math.copysign(1.0, yL - parent_y)
-        self._rect_v_run(parent_y, parent_y + dirD*self.calc["Lq70"], x, "W70", "Y_Q70_L")
-        self._rect_v_run(parent_y + dirD*self.calc["Lq70"], yL, x, "W100", "Y_100_L")
-        # parent -> filho alto
-        dirU = math.copysign(1.0, yH - parent_y)
-        self._rect_v_run(parent_y, parent_y + dirU*self.calc["Lq70"], x, "W70", "Y_Q70_H")
-        self._rect_v_run(parent_y + dirU*self.calc["Lq70"], yH, x, "W100", "Y_100_H")
+        rest = jobs[workers:]
+        done = set()  # índices em rest já criados pelo pool
 
-        self._build_y_tree(x, low, yL)
-        self._build_y_tree(x, high, yH)
+        def pooled(ex, idx):
+            futs = {ex.submit(run, rest[i]): i for i in idx}
+            err = None
+            for fut in as_completed(futs):
+                try:
+                    fut.result(); done.add(futs[fut])
+                except Exception as e:
+                    err = err or e
+            if err: raise err
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                n_probe = 2 * workers
+                t0 = time.perf_counter()
+                pooled(ex, range(n_probe))
+                t_par = (time.perf_counter() - t0) / n_probe
+                if t_par < 0.8 * t_ser:
+                    pooled(ex, range(n_probe, len(rest)))
+                    return
+            self._log(f"Rede em paralelo sem ganho ({t_par*1e3:.0f} vs {t_ser*1e3:.0f} ms/trecho); seguindo em série.")
+        except Exception as e:
+            self._log(f"Rede em paralelo falhou ({e}); refazendo {len(rest) - len(done)} trechos em série.")
+        for i, job in enumerate(rest):
+            if i not in done: run(job)
 
     # ---------- Simulação ----------
-    def _start(self):
+    def _start(self, target=None):
         if self.sim_running:
             self._log("Simulação já em execução."); return
         if not self._get_params(): return
@@ -586,136 +885,196 @@ class PatchArrayApp:
         self.bt_run.configure(state="disabled"); self.bt_stop.configure(state="normal")
         self.pb.set(0.0); self.lb_sim.configure(text="Iniciando…")
 
-        threading.Thread(target=self._run_sim, daemon=True).start()
+        threading.Thread(target=target or self._run_sim, daemon=True).start()
+
+    def _start_final(self):
+        """Executa com sweep Interpolating (verificação final do design)."""
+        if self.sim_running:
+            self._log("Simulação já em execução."); return
+        self._final_solve = True
+        self._start()
+        if not self.sim_running: self._final_solve = False
+
+    def _start_batch(self):
+        """Um projeto por espaçamento da lista, resolvidos em paralelo."""
+        grid = [{"spacing_scale": float(v)} for v in self.cb_spacing.cget("values")]
+        self._start(target=lambda: self._run_batch(grid))
 
     def _stop(self):
         self._log("Parada solicitada (não hard-kill).")
         self.sim_running = False
 
-    def _run_sim(self):
-        try:
-            self.lb_sim.configure(text="Abrindo AEDT…"); self.pb.set(0.05)
-            # Desktop
+    def _ensure_desktop(self):
+        """Conecta (ou abre) a sessão AEDT em self.desktop."""
+        if self.desktop is None:
+            # reaproveita uma sessão AEDT aberta (evita ~30 s de inicialização)
+            if not self.p["force_new_aedt"]:
+                try:
+                    self.desktop = Desktop(version="2024.2", non_graphical=False, new_desktop=False)
+                    self._log("Conectado a sessão AEDT existente.")
+                except Exception as e:
+                    self._log(f"Sem sessão AEDT para reaproveitar ({e}); abrindo nova.")
             if self.desktop is None:
                 self.desktop = Desktop(version="2024.2", non_graphical=False, new_desktop=True)
                 self._log("Desktop inicializado.")
 
+    def _new_project(self, proj: str):
+        """Cria projeto/design "patch_array" salvo em proj e conecta self.hfss."""
+        oDesktop = self.desktop.odesktop
+        oDesktop.NewProject()
+        oProject = oDesktop.GetActiveProject()
+        if "patch_array" not in [d.GetName() for d in oProject.GetDesigns()]:
+            oProject.InsertDesign("HFSS", "patch_array", "DrivenModal", "")
+        oProject.SetActiveDesign("patch_array")
+        try: oProject.SaveAs(proj, True)
+        except Exception: pass
+
+        self.hfss = Hfss(project=oProject.GetName(), design="patch_array",
+                         solution_type="DrivenModal", new_desktop=False)
+        self.hfss.modeler.model_units = "mm"
+        self._log(f"Projeto ativo: {proj}")
+
+    def _run_sim(self):
+        try:
+            self.lb_sim.configure(text="Abrindo AEDT…"); self.pb.set(0.05)
+            self._ensure_desktop()
             if self.tempdir is None:
                 self.tempdir = tempfile.TemporaryDirectory(suffix=".ansys")
-            proj = os.path.join(self.tempdir.name, f"patch_array_{datetime.now():%Y%m%d_%H%M%S}.aedt")
-
-            oDesktop = self.desktop.odesktop
-            oDesktop.NewProject()
-            oProject = oDesktop.GetActiveProject()
-            if "patch_array" not in [d.GetName() for d in oProject.GetDesigns()]:
-                oProject.InsertDesign("HFSS", "patch_array", "DrivenModal", "")
-            oProject.SetActiveDesign("patch_array")
-            try: oProject.SaveAs(proj, True)
-            except Exception: pass
+            self._new_project(os.path.join(self.tempdir.name, f"patch_array_{datetime.now():%Y%m%d_%H%M%S}.aedt"))
+            self._build_design()
 
-            self.hfss = Hfss(project=oProject.GetName(), design="patch_array",
-                             solution_type="DrivenModal", new_desktop=False)
-            self.hfss.modeler.model_units = "mm"
-            self._log(f"Projeto ativo: {proj}")
-
-            # Materiais
-            mat = self.p["substrate_material"]
-            if not self.hfss.materials.checkifmaterialexists(mat):
-                mat = "Custom_Substrate"
-                if not self.hfss.materials.checkifmaterialexists(mat):
-                    self.hfss.materials.add_material(mat)
-                m = self.hfss.materials.material_keys[mat]
-                m.permittivity = self.p["er"]; m.dielectric_loss_tangent = self.p["tan_d"]
-
-            # ---- Variáveis de design (PARÂMETROS) ----
-            # Tecnológicos / geom. macro
-            self._set_var("h_sub", self.p["h_sub"])
-            self._set_var("t_cu",  self.p["t_cu"])
-            self._set_var("patchL", self.calc["patchL"])
-            self._set_var("patchW", self.calc["patchW"])
-            self._set_var("spacingX", self.calc["spacingX"])
-            self._set_var("spacingY", self.calc["spacingY"])
-            self._set_var("subW", self.calc["subW"])
-            self._set_var("subL", self.calc["subL"])
-            self._set_var("W50",  self.calc["W50"])
-            self._set_var("W70",  self.calc["W70"])
-            self._set_var("W100", self.calc["W100"])
-            self._set_var("W141", self.calc["W141"])
-            self._set_var("W200", self.calc["W200"])
-            self._set_var("Lq70",  self.calc["Lq70"])
-            self._set_var("Lq141", self.calc["Lq141"])
-            self._set_var("OVL",   self.p["ovl"])
-
-            # ---- Substrato e GND (usando VARIÁVEIS) ----
-            substrate = self.hfss.modeler.create_box(
-                ["-subW/2","-subL/2", 0], ["subW","subL","h_sub"],
-                name=self._safe_name("Substrate"), material=mat)
-            ground = self.hfss.modeler.create_rectangle(
-                "XY", ["-subW/2","-subL/2", 0], ["subW","subL"],
-                name=self._safe_name("Ground"), material="copper")
-
-            # ---- Porta coaxial no centro (0,0) ----
-            top_pad = self._coax_lumped(0.0, 0.0, ground, substrate)
-
-            # ---- Patches + stub 200 Ω parametrizados ----
-            Wp = self.calc["patchW"]; Lp = self.calc["patchL"]
-            sx = self.calc["spacingX"]; sy = self.calc["spacingY"]
-
-            xs = [-( (self.cols-1)/2.0 - j)*(Wp + sx) for j in range(self.cols)]
-            ys = [ ( (self.rows-1)/2.0 - i)*(Lp + sy) for i in range(self.rows)]
-
-            # cria patches centrados em (x,y) e um stub 200 Ω OBLIGATORIAMENTE conectado
-            for x in xs:
-                for y in ys:
-                    # patch com variáveis patchW/patchL
-                    self.hfss.modeler.create_rectangle("XY",
-                        [f"{x}-patchW/2", f"{y}-patchL/2", "h_sub"],
-                        ["patchW", "patchL"],
-                        name=self._safe_name("Patch"), material="copper")
-
-                    # stub 200 Ω horizontal do eixo da coluna (x) à borda interna do patch
-                    # lado depende de x sinal (para centralizar a coluna no centro do patch)
-                    if x >= 0:
-                        # borda esquerda do patch: inicia um pouco antes para OVL
-                        x_edge = x - Wp/2.0
-                        self._rect_xy(f"{x_edge}-OVL", f"{y}-W200/2", f"{abs(x - x_edge)+self.p['ovl']:.6f}", "W200", "STUB200_L")
-                    else:
-                        # borda direita
-                        x_edge = x + Wp/2.0
-                        self._rect_xy(f"{x}", f"{y}-W200/2", f"{abs(x_edge - x)+self.p['ovl']:.6f}", "W200", "STUB200_R")
-
-            # ---- Tronco central 50 Ω curto (pad -> rede) ----
-            self._rect_xy("-W50/2", "-W50/2", "W50", "W50", "FEED50")  # quadradinho de 50Ω sobre o topo do pad
-
-            # ---- H-tree: X (para colunas), depois Y (por coluna) ----
-            self._log("Construindo rede corporativa…")
-            leaves = self._build_x_tree(xs, 0.0, 0.0)
-            for x_col, _ in leaves:
-                ys_col = sorted(ys)
-                self._build_y_tree(x_col, ys_col, 0.0)
-
-            # ---- Boundaries ----
-            self._log("Definindo PerfectE…")
-            names = [ground.name]
-            try:
-                if hasattr(top_pad, "name"):
-                    names.append(top_pad.name)
-            except Exception:
-                pass
-            # não tentamos unir; muitas folhas podem falhar; PerfectE cobre as folhas top metal
-            try:
-                self.hfss.assign_perfecte_to_sheets(list(dict.fromkeys(names)))
-            except Exception as e:
-                self._log(f"Aviso PerfectE: {e}")
+            if bool(self.ch_save.get()):
+                self.hfss.save_project()
+
+            self.lb_sim.configure(text="Analisando…"); self.pb.set(0.78)
+            self._adaptive_s11 = None
+            key = self._geom_key()
+            self._link_cached_mesh(key)
+            self.hfss.analyze_setup("Setup1", cores=int(self.p.get("cores", 4)))
+            self.hfss.save_project()  # a solução em disco é a fonte do mesh link
+            self._mesh_cache[key] = self.hfss.project_file
+            if self._sweep_kind == "Adaptive":
+                self._adaptive_sweep(self.p["sweep_start"], self.p["sweep_stop"])
+
+            # ---- Resultados ----
+            self.lb_sim.configure(text="Extraindo resultados…"); self.pb.set(0.92)
+            self._plot_results()
+            self.lb_sim.configure(text="Concluído"); self.pb.set(1.0)
+            self._log("Simulação concluída.")
+        except Exception as e:
+            self._log(f"ERRO: {e}\n{traceback.format_exc()}")
+            self.lb_sim.configure(text=f"Erro: {e}")
+        finally:
+            self.bt_run.configure(state="normal"); self.bt_stop.configure(state="disabled")
+            self.sim_running = False
+            self._final_solve = False
+
+    def _build_design(self):
+        """Geometria, porta, contornos, setup e sweep no design ativo (self.hfss)."""
+        # Materiais (cache do projeto; a biblioteca só é consultada se faltar)
+        self._known_materials = set(self.hfss.materials.material_keys.keys())
+        mat = self.p["substrate_material"]
+        if mat.lower() not in self._known_materials and self.hfss.materials.checkifmaterialexists(mat):
+            self._known_materials.add(mat.lower())
+        if mat.lower() not in self._known_materials:
+            mat = "Custom_Substrate"
+            if mat.lower() not in self._known_materials:
+                self.hfss.materials.add_material(mat)
+                self._known_materials.add(mat.lower())
+            m = self.hfss.materials.material_keys[mat.lower()]
+            m.permittivity = self.p["er"]; m.dielectric_loss_tangent = self.p["tan_d"]
+
+        # ---- Variáveis de design (PARÂMETROS) ----
+        # Tecnológicos / geom. macro
+        c = self.calc
+        self._set_vars_bulk({
+            "h_sub": self.p["h_sub"], "t_cu": self.p["t_cu"],
+            "patchL": c["patchL"], "patchW": c["patchW"],
+            "spacingX": c["spacingX"], "spacingY": c["spacingY"],
+            "subW": c["subW"], "subL": c["subL"],
+            **{k: c[k] for k in Z0_WVARS},
+            "Lq70": c["Lq70"], "Lq141": c["Lq141"],
+            "OVL": self.p["ovl"],
+        })
+
+        # ---- Substrato e GND (usando VARIÁVEIS) ----
+        substrate = self.hfss.modeler.create_box(
+            ["-subW/2","-subL/2", 0], ["subW","subL","h_sub"],
+            name=self._safe_name("Substrate"), material=mat)
+        ground = self.hfss.modeler.create_rectangle(
+            "XY", ["-subW/2","-subL/2", 0], ["subW","subL"],
+            name=self._safe_name("Ground"), material="copper")
+
+        # ---- Porta coaxial no centro (0,0) ----
+        top_pad = self._coax_lumped(0.0, 0.0, ground, substrate)
+
+        # ---- Patches + stub 200 Ω parametrizados ----
+        Wp_half = 0.5*self.calc["patchW"]; ovl = self.p["ovl"]
+        xs_arr, ys_arr = self._patch_axes()
+        centers = self._patch_centers()
+
+        # cria patches centrados em (x,y) e um stub 200 Ω OBLIGATORIAMENTE conectado
+        # (descritores acumulados e criados numa única chamada ao AEDT)
+        X, Y = centers[:, 0], centers[:, 1]
+        # stub 200 Ω horizontal do eixo da coluna (x) à borda interna do patch;
+        # x>=0: borda esquerda (inicia OVL antes), x<0: borda direita
+        left = X >= 0
+        x_edge = np.where(left, X - Wp_half, X + Wp_half)
+        fmt = lambda a: np.char.mod("%.6f", a)
+        xs_s, ys_s = fmt(X), fmt(Y)
+        patch_x = np.char.add(xs_s, "-patchW/2").tolist()
+        patch_y = np.char.add(ys_s, "-patchL/2").tolist()
+        stub_x = np.where(left, np.char.add(fmt(x_edge), "-OVL"), xs_s).tolist()
+        stub_y = np.char.add(ys_s, "-W200/2").tolist()
+        stub_w = fmt(np.abs(X - x_edge) + ovl).tolist()
+
+        prims = []
+        add, name = prims.append, self._safe_name
+        for i, is_left in enumerate(left.tolist()):
+            # patch com variáveis patchW/patchL
+            add((name("Patch"), patch_x[i], patch_y[i], "patchW", "patchL"))
+            add((name("STUB200_L" if is_left else "STUB200_R"), stub_x[i], stub_y[i], stub_w[i], "W200"))
+        self._create_rects_batch(prims)
+
+        # ---- Tronco central 50 Ω curto (pad -> rede) ----
+        self._rect_xy("-W50/2", "-W50/2", "W50", "W50", "FEED50")  # quadradinho de 50Ω sobre o topo do pad
+
+        # ---- H-tree: X (para colunas), depois Y (por coluna) ----
+        self._log("Construindo rede corporativa…")
+        jobs: list = []
+        leaves = self._build_x_tree(xs_arr.tolist(), 0.0, 0.0, jobs)
+        # a árvore Y é a mesma em toda coluna (só muda x): calcula uma vez e replica
+        y_tpl: list = []
+        self._build_y_tree(0.0, ys_arr.tolist(), 0.0, y_tpl)
+        for x_col, _ in leaves:
+            jobs.extend((k, a, b, x_col, w, n) for k, a, b, _x, w, n in y_tpl)
+        self._create_runs(jobs)
+
+        # ---- Boundaries ----
+        self._log("Definindo PerfectE…")
+        names = [ground.name]
+        try:
+            top_name = getattr(top_pad, "name", None)
+            # nomes vêm de _safe_name (únicos); só evita repetir o GND
+            if top_name and top_name != names[0]:
+                names.append(top_name)
+        except Exception:
+            pass
+        # não tentamos unir; muitas folhas podem falhar; PerfectE cobre as folhas top metal
+        try:
+            self.hfss.assign_perfecte_to_sheets(names)
+        except Exception as e:
+            self._log(f"Aviso PerfectE: {e}")
 
-            # ---- Região + radiação ----
-            self._log("Criando região e Radiação…")
-            lam0_start_mm = C0 / (self.p["sweep_start"] * 1e9) * 1000.0
-            pad_mm = max(5.0, min(0.25 * lam0_start_mm, 15.0))
-            region = self.hfss.modeler.create_region([pad_mm]*6, is_percentage=False)
-            self.hfss.assign_radiation_boundary_to_objects(region)
+        # ---- Região + radiação ----
+        self._log("Criando região e Radiação…")
+        lam0_start_mm = C0 / (self.p["sweep_start"] * 1e9) * 1000.0
+        pad_mm = max(5.0, min(0.25 * lam0_start_mm, 15.0))
+        region = self.hfss.modeler.create_region([pad_mm]*6, is_percentage=False)
+        self.hfss.assign_radiation_boundary_to_objects(region)
 
-            # Infinite sphere
+        # Infinite sphere (só se o far-field for extraído)
+        if self._need_farfield():
             try:
                 rf = self.hfss.odesign.GetModule("RadField")
                 rf.InsertInfiniteSphereSetup([
@@ -725,130 +1084,328 @@ class PatchArrayApp:
             except Exception as e:
                 self._log(f"InfiniteSphere aviso: {e}")
 
-            self.pb.set(0.70); self.lb_sim.configure(text="Configurando Setup…")
+        self.pb.set(0.70); self.lb_sim.configure(text="Configurando Setup…")
+
+        # ---- Setup + sweep ----
+        setup = self.hfss.create_setup(name="Setup1", setup_type="HFSSDriven")
+        setup.props["Frequency"] = f"{self.p['frequency']}GHz"
+        setup.props["MaxDeltaS"] = 0.02
+        st = self.p["sweep_type"]
+        if self._final_solve:
+            st = "Interpolating"
+        if st == "Fast":
+            self._log("Usando sweep Fast; rode \"Solução final\" (Interpolating) para o resultado definitivo.")
+        self._sweep_kind = st
+        try:
+            if st == "Adaptive":
+                pass  # pontos escolhidos e resolvidos em _adaptive_sweep
+            elif st == "Discrete":
+                setup.create_linear_step_sweep(unit="GHz", start_frequency=self.p["sweep_start"],
+                                               stop_frequency=self.p["sweep_stop"], step_size=self.p["sweep_step"], name="Sweep1")
+            elif st == "Fast":
+                setup.create_frequency_sweep(unit="GHz", name="Sweep1",
+                                             start_frequency=self.p["sweep_start"],
+                                             stop_frequency=self.p["sweep_stop"], sweep_type="Fast")
+            else:
+                setup.create_frequency_sweep(unit="GHz", name="Sweep1",
+                                             start_frequency=self.p["sweep_start"],
+                                             stop_frequency=self.p["sweep_stop"], sweep_type="Interpolating")
+        except Exception as e:
+            self._log(f"Sweep aviso: {e}")
+
+    def _geom_key(self) -> str:
+        """Hash da geometria/materiais: mesma chave => mesma malha reaproveitável."""
+        keys = ("h_sub", "t_cu", "er", "tan_d", "substrate_material", "probe_radius", "coax_ba_ratio",
+                "coax_wall", "coax_Lp", "antipad", "ovl", "sweep_start", "frequency")
+        d = {"rows": self.rows, "cols": self.cols,
+             "p": {k: self.p[k] for k in keys},
+             "calc": {k: round(v, 9) for k, v in sorted(self.calc.items())}}
+        return hashlib.blake2b(json.dumps(d, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+    def _link_cached_mesh(self, key: str):
+        """Se a mesma geometria já foi resolvida, parte da malha adaptada dela (mesh link)."""
+        src = self._mesh_cache.get(key)
+        if not src or not os.path.exists(src): return
+        try:
+            self.hfss.get_setup("Setup1").add_mesh_link(design="patch_array", solution="Setup1 : LastAdaptive",
+                                                        project=src, force_source_to_solve=False)
+            self._log(f"Malha inicial importada de {os.path.basename(src)}.")
+        except Exception as e:
+            self._log(f"Mesh link aviso: {e}")
 
-            # ---- Setup + sweep ----
-            setup = self.hfss.create_setup(name="Setup1", setup_type="HFSSDriven")
-            setup.props["Frequency"] = f"{self.p['frequency']}GHz"
-            setup.props["MaxDeltaS"] = 0.02
-            st = self.p["sweep_type"]
+    def _adaptive_sweep(self, f_lo: float, f_hi: float, tol: float = 1e-2, max_iter: int = 30):
+        """
+        Sweep adaptativo: resolve S11 só nos pontos escolhidos (sweeps de ponto
+        único) e ajusta um modelo racional AAA/Loewner; cada novo ponto vai onde
+        o modelo mais mudou entre iterações, até |ΔS11| < tol. Um único sweep
+        temporário "SweepA" por iteração: resolvido sozinho e apagado após a leitura.
+        """
+        setup = self.hfss.get_setup("Setup1")
+        expr = f"S({self._portname},{self._portname})"
+        grid = np.linspace(f_lo, f_hi, 401)
+        samples: Dict[float, complex] = {}
+        todo = np.linspace(f_lo, f_hi, 5).tolist()
+        prev = model = None
+        for it in range(max_iter):
+            if not self.sim_running: break
+            sweep = setup.create_single_point_sweep(unit="GHz", freq=[round(f, 6) for f in todo], name="SweepA")
             try:
-                if st == "Discrete":
-                    setup.create_linear_step_sweep(unit="GHz", start_frequency=self.p["sweep_start"],
-                                                   stop_frequency=self.p["sweep_stop"], step_size=self.p["sweep_step"], name="Sweep1")
-                elif st == "Fast":
-                    setup.create_frequency_sweep(unit="GHz", name="Sweep1",
-                                                 start_frequency=self.p["sweep_start"],
-                                                 stop_frequency=self.p["sweep_stop"], sweep_type="Fast")
+                # só o sweep: a malha adaptada do Setup1 já está resolvida
+                self.hfss.odesign.Analyze(f"Setup1 : {sweep.name}")
+                sol = self.hfss.post.get_solution_data(expressions=[expr], setup_sweep_name=f"Setup1 : {sweep.name}")
+                fr = np.asarray(sol.primary_sweep_values, dtype=float)
+                z = np.asarray(sol.data_real(expr), dtype=float) + 1j*np.asarray(sol.data_imag(expr), dtype=float)
+            finally:
+                sweep.delete()
+            samples.update(zip(fr.tolist(), z.tolist()))
+
+            f_s = np.array(sorted(samples)); z_s = np.array([samples[f] for f in f_s])
+            model = aaa_eval(*aaa_fit(f_s, z_s), grid)
+            if prev is None:
+                todo = (0.5*(f_s[1:] + f_s[:-1])).tolist()   # completa com os pontos médios
+            else:
+                err = np.abs(model - prev)
+                k = int(np.argmax(err))
+                self._log(f"Adaptive: {len(samples)} pontos, max|ΔS11| = {err[k]:.3g}")
+                if err[k] < tol: break
+                todo = [float(grid[k])]
+            prev = model
+
+        if model is None: return
+        s11_db = 20*np.log10(np.maximum(np.abs(model), 1e-12))
+        self._adaptive_s11 = (grid, s11_db)
+        self._log(f"Sweep adaptativo: {len(samples)} frequências resolvidas.")
+
+    # ---------- Lote ----------
+    def _batch_solve(self, proj: str, cores: int) -> int:
+        """Resolve um .aedt num processo ansysedt -batchsolve independente."""
+        exe = os.path.join(self.desktop.install_path, "ansysedt.exe" if os.name == "nt" else "ansysedt")
+        cmd = [exe, "-ng", "-batchsolve", "-machinelist", f"num={cores}", proj]
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+
+    def _batch_state(self, cfg: dict) -> "PatchArrayApp":
+        """
+        Cópia rasa do app com p/calc/buffers próprios para uma configuração do lote:
+        o worker constrói sobre ela e o estado da GUI (self.p, self.calc, self.hfss) fica intacto.
+        """
+        st = copy.copy(self)
+        # sweep com faixa completa: "Adaptive" não cria Sweep1 e o -batchsolve não roda _adaptive_sweep
+        st.p = {**self.p, **cfg, "sweep_type": "Interpolating"}
+        st.calc = {}
+        st._widths = np.empty_like(self._widths); st._qwls = np.empty_like(self._qwls)
+        st._pending_vars = {}
+        st._final_solve = False; st._adaptive_s11 = None
+        st.hfss = None
+        st._compute_calc()
+        return st
+
+    def _run_batch(self, param_grid: List[dict]):
+        """
+        Um projeto por configuração (self.p + cfg) em pasta própria, resolvidos em
+        paralelo (até cpu_count // cores solves) e S11 agregado em batch_results.csv.
+        """
+        import pandas as pd
+        cores = max(1, int(self.p.get("cores", 4)))
+        max_parallel = max(1, (os.cpu_count() or 1) // cores)
+        if self.tempdir is None:
+            self.tempdir = tempfile.TemporaryDirectory(suffix=".ansys")
+        root = tempfile.mkdtemp(prefix="patch_batch_", dir=self.tempdir.name)
+        self._log(f"Projetos do lote em {root}")
+        built = []
+        try:
+            self.lb_sim.configure(text="Abrindo AEDT…"); self.pb.set(0.02)
+            self._ensure_desktop()
+
+            # 1) gera e salva um projeto por configuração
+            for k, cfg in enumerate(param_grid):
+                if not self.sim_running: break
+                st = self._batch_state(cfg)
+                proj = os.path.join(root, f"cfg{k:03d}", "patch_array.aedt")
+                os.makedirs(os.path.dirname(proj), exist_ok=True)
+                st._new_project(proj)
+                st._build_design()
+                st.hfss.save_project()
+                st.hfss.close_project(save=False)
+                built.append((cfg, proj, st))
+                self.pb.set(0.05 + 0.35 * (k + 1) / len(param_grid))
+                self._log(f"Lote {k+1}/{len(param_grid)}: {cfg} -> {proj}")
+
+            # 2) solves independentes em paralelo
+            self.lb_sim.configure(text=f"Resolvendo lote ({max_parallel} em paralelo)…")
+            with ThreadPoolExecutor(max_workers=max_parallel) as ex:
+                futs = {ex.submit(self._batch_solve, proj, cores): (cfg, proj) for cfg, proj, _ in built}
+                for n, fut in enumerate(as_completed(futs), 1):
+                    cfg, proj = futs[fut]
+                    self._log(f"Solve {cfg}: código {fut.result()}")
+                    self.pb.set(0.40 + 0.45 * n / len(futs))
+
+            # 3) agrega S11 de cada projeto
+            frames = []
+            for cfg, proj, st in built:
+                st.hfss = Hfss(project=proj, design="patch_array", new_desktop=False)
+                s11 = st._read_s11()
+                if s11 is not None:
+                    frames.append(pd.DataFrame({"freq_ghz": s11[0], "s11_db": s11[1]}).assign(**cfg))
                 else:
-                    setup.create_frequency_sweep(unit="GHz", name="Sweep1",
-                                                 start_frequency=self.p["sweep_start"],
-                                                 stop_frequency=self.p["sweep_stop"], sweep_type="Interpolating")
-            except Exception as e:
-                self._log(f"Sweep aviso: {e}")
-
-            if bool(self.ch_save.get()):
-                self.hfss.save_project()
-
-            self.lb_sim.configure(text="Analisando…"); self.pb.set(0.78)
-            self.hfss.analyze_setup("Setup1", cores=int(self.p.get("cores", 4)))
-
-            # ---- Resultados ----
-            self.lb_sim.configure(text="Extraindo resultados…"); self.pb.set(0.92)
-            self._plot_results()
-            self.lb_sim.configure(text="Concluído"); self.pb.set(1.0)
-            self._log("Simulação concluída.")
+                    self._log(f"S11 indisponível para {cfg}")
+                st.hfss.close_project(save=False)
+            if frames:
+                pd.concat(frames, ignore_index=True).to_csv("batch_results.csv", index=False)
+                self._log(f"Lote concluído: {len(frames)} resultados em batch_results.csv")
+            self.lb_sim.configure(text="Lote concluído"); self.pb.set(1.0)
         except Exception as e:
-            self._log(f"ERRO: {e}\n{traceback.format_exc()}")
+            self._log(f"ERRO lote: {e}\n{traceback.format_exc()}")
             self.lb_sim.configure(text=f"Erro: {e}")
         finally:
+            # projetos resolvidos podem ter GBs: só o CSV agregado fica
+            shutil.rmtree(root, ignore_errors=True)
+            self._log(f"Pasta do lote removida: {root}")
             self.bt_run.configure(state="normal"); self.bt_stop.configure(state="disabled")
             self.sim_running = False
 
     # ---------- Resultados ----------
-    def _plot_results(self):
-        self._log("Plotando…")
-        self.ax_s11.clear(); self.ax_ff.clear()
-        self.ax_s11.grid(True, alpha=0.35); self.ax_ff.grid(True, alpha=0.35)
+    def _ensure_figure(self):
+        """Cria figura, eixos e artistas só quando chegam os primeiros resultados."""
+        if self._results_ready: return
+        matplotlib.rcParams.update(self._plot_theme())
+        self.fig = plt.figure(figsize=(10, 8), dpi=100)
+        self.ax_s11 = self.fig.add_subplot(2,1,1)
+        self.ax_ff  = self.fig.add_subplot(2,1,2)
         self.ax_s11.set_title("S11"); self.ax_s11.set_xlabel("Frequência (GHz)"); self.ax_s11.set_ylabel("dB")
-        self.ax_ff.set_title(f"Ganho — cortes @ {self.p['frequency']} GHz"); self.ax_ff.set_xlabel("Ângulo (graus)"); self.ax_ff.set_ylabel("dB")
+        self.ax_ff.set_xlabel("Ângulo (graus)"); self.ax_ff.set_ylabel("dB")
 
-        # --- S11 robusto ---
+        # artistas reaproveitados a cada nova simulação (set_data)
+        self._s11_line, = self.ax_s11.plot([], [], lw=2, label="S11")
+        self._s11_ref = self.ax_s11.axhline(-10, ls="--", alpha=0.6, label="-10 dB")
+        self._f0_line = self.ax_s11.axvline(self.p["frequency"], ls="--", alpha=0.6)
+        self._ff_lines = {lab: self.ax_ff.plot([], [], lw=2, label=lab)[0] for lab in ("Phi=0°", "Theta=90°")}
+        self._na_text = {ax: ax.text(0.5,0.5,"",ha="center",va="center",transform=ax.transAxes)
+                         for ax in (self.ax_s11, self.ax_ff)}
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self._results_ready = True
+
+    @staticmethod
+    def _plot_theme() -> Dict[str, Any]:
+        """rcParams do Matplotlib correspondentes ao tema CTk atual."""
+        is_dark = ctk.get_appearance_mode() == "Dark"
+        face = '#1e1e1e' if is_dark else '#ffffff'
+        text = 'white' if is_dark else 'black'
+        return {
+            'figure.facecolor': face, 'axes.facecolor': face,
+            'axes.edgecolor': '#a0a0a0' if is_dark else 'black', 'axes.labelcolor': text, 'axes.titlecolor': text,
+            'xtick.color': text, 'ytick.color': text, 'text.color': text,
+            'axes.grid': True, 'grid.alpha': 0.35,
+        }
+
+    def _update_plots(self, s11, cuts):
+        """Atualiza os artistas (thread principal): s11=(f, dB) ou None; cuts={rótulo: (ângulo, dB)}."""
+        self._ensure_figure()
+        f32 = lambda xy: tuple(np.asarray(a).astype(np.float32, copy=False) for a in xy)  # Agg rasteriza em float32
+        ok = s11 is not None
+        self._s11_line.set_data(*(f32(s11) if ok else ([], [])))
+        self._f0_line.set_xdata([self.p["frequency"]]*2)
+        for a in (self._s11_line, self._s11_ref, self._f0_line): a.set_visible(ok)
+        self._na_text[self.ax_s11].set_text("" if ok else "S11 indisponível")
+
+        for lab, ln in self._ff_lines.items():
+            ln.set_data(*f32(cuts.get(lab, ([], []))))
+            ln.set_visible(lab in cuts)
+        self._na_text[self.ax_ff].set_text("" if cuts else "Far-field indisponível")
+        self.ax_ff.set_title(f"Ganho — cortes @ {self.p['frequency']} GHz")
+
+        for ax, handles in ((self.ax_s11, [self._s11_line, self._s11_ref] if ok else []),
+                            (self.ax_ff, [ln for ln in self._ff_lines.values() if ln.get_visible()])):
+            if handles: ax.legend(handles=handles)
+            elif ax.get_legend(): ax.get_legend().remove()
+            ax.relim(visible_only=True); ax.autoscale_view()
+
+        self.fig.tight_layout(); self.canvas.draw_idle()
+
+    def _read_s11(self):
+        """S11 (f GHz, dB) do design ativo, tentando expressões/contextos; None se indisponível."""
         sol = None
         port_exprs = [f"dB(S({self._portname},{self._portname}))", "dB(S(1,1))"]
         ctxs = ["Setup1: Sweep1", "Setup1 : Sweep1", "Setup1 : LastAdaptive", "Setup1:LastAdaptive"]
+        for expr in port_exprs:
+            try:
+                rpt = self.hfss.post.reports_by_category.standard(expressions=[expr])
+                ok = False
+                for ctx in ctxs:
+                    try:
+                        rpt.context = [ctx]
+                        sol = rpt.get_solution_data()
+                        if sol and hasattr(sol, "primary_sweep_values"):
+                            ok = True; break
+                    except Exception:
+                        sol = None
+                if ok: break
+            except Exception:
+                continue
+
+        if sol:
+            f = np.asarray(sol.primary_sweep_values, dtype=float)
+            dat = sol.data_real()
+            y = np.asarray(dat[0] if isinstance(dat, (list,tuple)) else dat, dtype=float)
+            if f.size and f.size == y.size:
+                return f, y
+        return None
+
+    def _need_farfield(self) -> bool:
+        """Far-field (esfera IS1 e cortes) só se pedido; lido de self.p, seguro no worker."""
+        return bool(self.p["farfield"])
+
+    def _plot_results(self):
+        self._log("Plotando…")
+
+        # --- S11 robusto ---
+        s11 = None
         try:
-            for expr in port_exprs:
-                try:
-                    rpt = self.hfss.post.reports_by_category.standard(expressions=[expr])
-                    ok = False
-                    for ctx in ctxs:
-                        try:
-                            rpt.context = [ctx]
-                            sol = rpt.get_solution_data()
-                            if sol and hasattr(sol, "primary_sweep_values"):
-                                ok = True; break
-                        except Exception:
-                            sol = None
-                    if ok: break
-                except Exception:
-                    continue
-
-            if sol:
-                f = np.asarray(sol.primary_sweep_values, dtype=float)
-                dat = sol.data_real()
-                y = np.asarray(dat[0] if isinstance(dat, (list,tuple)) else dat, dtype=float)
-                if f.size and f.size == y.size:
-                    self.sim_data = np.column_stack((f, y))
-                    self.ax_s11.plot(f, y, lw=2, label="S11")
-                    self.ax_s11.axhline(-10, ls="--", alpha=0.6, label="-10 dB")
-                    self.ax_s11.axvline(self.p["frequency"], ls="--", alpha=0.6)
-                    self.ax_s11.legend()
-                else:
-                    self.ax_s11.text(0.5,0.5,"S11 indisponível",ha="center",va="center",transform=self.ax_s11.transAxes)
-            else:
-                self.ax_s11.text(0.5,0.5,"S11 indisponível",ha="center",va="center",transform=self.ax_s11.transAxes)
+            s11 = self._adaptive_s11 if self._adaptive_s11 is not None else self._read_s11()
+            if s11 is not None:
+                f, y = s11
+                if self.sim_data is None or self.sim_data.shape != (f.size, 2):
+                    self.sim_data = np.empty((f.size, 2))  # reaproveita o buffer entre execuções
+                self.sim_data[:, 0] = f
+                self.sim_data[:, 1] = y
         except Exception as e:
             self._log(f"S11 falhou: {e}")
-            self.ax_s11.text(0.5,0.5,"S11 indisponível",ha="center",va="center",transform=self.ax_s11.transAxes)
 
         # --- Far-field (dois cortes) robusto ---
-        try:
-            ff_ok = False
-            # θ (Phi=0)
-            rep1 = self.hfss.post.reports_by_category.far_field(
-                expressions=["dB(GainTotal)"], context="IS1", primary_sweep_variable="Theta",
-                setup="Setup1 : LastAdaptive",
-                variations={"Freq": f"{self.p['frequency']}GHz", "Phi": "0deg", "Theta": "All"},
-                name="FF_Theta_Phi0")
-            sd1 = rep1.get_solution_data() if hasattr(rep1, "get_solution_data") else None
-            if sd1:
-                th = np.asarray(sd1.primary_sweep_values, dtype=float)
-                g1 = np.asarray(sd1.data_real()[0], dtype=float)
-                if th.size > 1 and th.size == g1.size:
-                    self.ax_ff.plot(th, g1, lw=2, label="Phi=0°"); ff_ok = True
-
-            # φ (Theta=90)
-            rep2 = self.hfss.post.reports_by_category.far_field(
-                expressions=["dB(GainTotal)"], context="IS1", primary_sweep_variable="Phi",
-                setup="Setup1 : LastAdaptive",
-                variations={"Freq": f"{self.p['frequency']}GHz", "Theta": "90deg", "Phi": "All"},
-                name="FF_Phi_Theta90")
-            sd2 = rep2.get_solution_data() if hasattr(rep2, "get_solution_data") else None
-            if sd2:
-                ph = np.asarray(sd2.primary_sweep_values, dtype=float)
-                g2 = np.asarray(sd2.data_real()[0], dtype=float)
-                if ph.size > 1 and ph.size == g2.size:
-                    self.ax_ff.plot(ph, g2, lw=2, label="Theta=90°")
-
-            if ff_ok: self.ax_ff.legend()
-            else:
-                self.ax_ff.text(0.5,0.5,"Far-field indisponível",ha="center",va="center",transform=self.ax_ff.transAxes)
-        except Exception as e:
-            self._log(f"FF falhou: {e}")
-            self.ax_ff.text(0.5,0.5,"Far-field indisponível",ha="center",va="center",transform=self.ax_ff.transAxes)
+        cuts = {}
+        if self._need_farfield():
+            try:
+                # θ (Phi=0)
+                rep1 = self.hfss.post.reports_by_category.far_field(
+                    expressions=["dB(GainTotal)"], context="IS1", primary_sweep_variable="Theta",
+                    setup="Setup1 : LastAdaptive",
+                    variations={"Freq": f"{self.p['frequency']}GHz", "Phi": "0deg", "Theta": "All"},
+                    name="FF_Theta_Phi0")
+                sd1 = rep1.get_solution_data() if hasattr(rep1, "get_solution_data") else None
+                if sd1:
+                    th = np.asarray(sd1.primary_sweep_values, dtype=float)
+                    g1 = np.asarray(sd1.data_real()[0], dtype=float)
+                    if th.size > 1 and th.size == g1.size:
+                        cuts["Phi=0°"] = (th, g1)
+
+                # φ (Theta=90)
+                rep2 = self.hfss.post.reports_by_category.far_field(
+                    expressions=["dB(GainTotal)"], context="IS1", primary_sweep_variable="Phi",
+                    setup="Setup1 : LastAdaptive",
+                    variations={"Freq": f"{self.p['frequency']}GHz", "Theta": "90deg", "Phi": "All"},
+                    name="FF_Phi_Theta90")
+                sd2 = rep2.get_solution_data() if hasattr(rep2, "get_solution_data") else None
+                if sd2:
+                    ph = np.asarray(sd2.primary_sweep_values, dtype=float)
+                    g2 = np.asarray(sd2.data_real()[0], dtype=float)
+                    if ph.size > 1 and ph.size == g2.size:
+                        cuts["Theta=90°"] = (ph, g2)
+            except Exception as e:
+                self._log(f"FF falhou: {e}")
 
-        self.fig.tight_layout(); self.canvas.draw()
+        # Tk/Matplotlib só na thread principal: o worker apenas coleta os dados
+        self.win.after(0, lambda: self._update_plots(s11, cuts))
         self._log("Plot OK.")
 
     # ---------- Encerramento ----------
@@ -860,6 +1417,7 @@ class PatchArrayApp:
                     if bool(self.ch_save.get()): self.hfss.save_project()
                 except Exception as e: self._log(f"Salvar aviso: {e}")
             if self.desktop:
+                # só solta a conexão: o AEDT continua aberto para o próximo launch
                 try:
                     self.desktop.release_desktop(close_projects=False, close_on_exit=False)
                 except Exception as e: self._log(f"Release aviso: {e}")